@@ -0,0 +1,165 @@
+#include "symphony.h"
+#include <stdlib.h>
+
+/*strided_double_at, strided_int_at: element i of a strided input; a
+ *                                   stride of 0 broadcasts element 0.
+ */
+static double strided_double_at(struct strided_double input, size_t i)
+{
+  return *(const double *)((const char *)input.data
+                           + (ptrdiff_t)i * input.stride);
+}
+
+static int strided_int_at(struct strided_int input, size_t i)
+{
+  return *(const int *)((const char *)input.data
+                        + (ptrdiff_t)i * input.stride);
+}
+
+/*symphony_integrate_batch: evaluates count emissivities or absorptivities
+ *                          directly on the memory of the caller.  Each
+ *                          element starts from a copy of template_params,
+ *                          which sets the mode and any optional fields
+ *                          (e.g. use_n_surrogate), and takes its user
+ *                          params from the strided inputs.  Results are
+ *                          written to out, spaced out_stride bytes apart.
+ *
+ *@params: struct of parameters template_params (from setConstParams()),
+ *         number of elements count, strided inputs, output pointer out
+ *         and its stride in bytes out_stride
+ *@returns: the number of elements whose evaluation failed; these are set
+ *          to NAN in out.  If any failed and error_message is not NULL,
+ *          *error_message is set to the malloc()ed message of the first
+ *          failure.
+ */
+size_t symphony_integrate_batch(const struct parameters *template_params,
+                                size_t count,
+                                const struct batch_inputs *inputs,
+                                double *out,
+                                ptrdiff_t out_stride,
+                                char **error_message)
+{
+  return symphony_integrate_batch_progress(template_params, count, inputs,
+                                           out, out_stride, NULL, NULL,
+                                           NULL, error_message);
+}
+
+/*symphony_integrate_batch_progress: symphony_integrate_batch() that calls
+ *                                   progress(done, count, progress_data)
+ *                                   after each element, unless progress
+ *                                   is NULL.  A nonzero return value of
+ *                                   progress stops the batch before the
+ *                                   next element; the elements that were
+ *                                   not evaluated are left untouched in
+ *                                   out.
+ *
+ *@params: as symphony_integrate_batch(), plus the progress function and
+ *         its data pointer, and done, which (if not NULL) is set to the
+ *         number of elements evaluated
+ *@returns: the number of elements whose evaluation failed.
+ */
+size_t symphony_integrate_batch_progress(
+                                const struct parameters *template_params,
+                                size_t count,
+                                const struct batch_inputs *inputs,
+                                double *out,
+                                ptrdiff_t out_stride,
+                                batch_progress_function progress,
+                                void *progress_data,
+                                size_t *done,
+                                char **error_message)
+{
+  size_t failures = 0;
+  size_t i;
+
+  if (error_message != NULL)
+    *error_message = NULL;
+
+  for (i = 0; i < count; i++)
+  {
+    struct parameters params = *template_params;
+    char *element_error      = NULL;
+
+    params.nu               = strided_double_at(inputs->nu, i);
+    params.magnetic_field   = strided_double_at(inputs->magnetic_field, i);
+    params.electron_density = strided_double_at(inputs->electron_density, i);
+    params.observer_angle   = strided_double_at(inputs->observer_angle, i);
+    params.distribution     = strided_int_at(inputs->distribution, i);
+    params.polarization     = strided_int_at(inputs->polarization, i);
+    params.theta_e          = strided_double_at(inputs->theta_e, i);
+    params.power_law_p      = strided_double_at(inputs->power_law_p, i);
+    params.gamma_min        = strided_double_at(inputs->gamma_min, i);
+    params.gamma_max        = strided_double_at(inputs->gamma_max, i);
+    params.gamma_cutoff     = strided_double_at(inputs->gamma_cutoff, i);
+    params.kappa            = strided_double_at(inputs->kappa, i);
+    params.kappa_width      = strided_double_at(inputs->kappa_width, i);
+
+    double result = symphony_integrate(&params, &element_error);
+
+    *(double *)((char *)out + (ptrdiff_t)i * out_stride) = result;
+
+    if (element_error != NULL)
+    {
+      failures++;
+
+      /*keep the first error message for the caller */
+      if (error_message != NULL && *error_message == NULL)
+        *error_message = element_error;
+      else
+        free(element_error);
+    }
+
+    /*cooperative cancellation between elements */
+    if (progress != NULL && progress(i + 1, count, progress_data) != 0)
+    {
+      i++;
+      break;
+    }
+  }
+
+  if (done != NULL)
+    *done = i;
+
+  return failures;
+}
+
+/*j_nu_batch: batch version of j_nu(); see symphony_integrate_batch().
+ *
+ *@params: number of elements count, strided inputs, output pointer out
+ *         and its stride in bytes out_stride
+ *@returns: the number of elements whose evaluation failed.
+ */
+size_t j_nu_batch(size_t count,
+                  const struct batch_inputs *inputs,
+                  double *out,
+                  ptrdiff_t out_stride,
+                  char **error_message)
+{
+  struct parameters params;
+  setConstParams(&params);
+  params.mode = params.EMISSIVITY;
+
+  return symphony_integrate_batch(&params, count, inputs, out, out_stride,
+                                  error_message);
+}
+
+/*alpha_nu_batch: batch version of alpha_nu(); see
+ *                symphony_integrate_batch().
+ *
+ *@params: number of elements count, strided inputs, output pointer out
+ *         and its stride in bytes out_stride
+ *@returns: the number of elements whose evaluation failed.
+ */
+size_t alpha_nu_batch(size_t count,
+                      const struct batch_inputs *inputs,
+                      double *out,
+                      ptrdiff_t out_stride,
+                      char **error_message)
+{
+  struct parameters params;
+  setConstParams(&params);
+  params.mode = params.ABSORPTIVITY;
+
+  return symphony_integrate_batch(&params, count, inputs, out, out_stride,
+                                  error_message);
+}
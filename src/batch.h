@@ -0,0 +1,76 @@
+#ifndef SYMPHONY_BATCH_H_
+#define SYMPHONY_BATCH_H_
+
+#include <stddef.h>
+#include "params.h"
+
+/*Strided views of one input of a batch evaluation: element i is found
+  stride bytes after element i-1, starting at data.  A stride of 0
+  broadcasts the single value at data to every element, so scalars and
+  both array-of-structs and struct-of-arrays layouts of the host code can
+  be used in place. */
+struct strided_double
+{
+  const double *data;
+  ptrdiff_t stride;
+};
+
+struct strided_int
+{
+  const int *data;
+  ptrdiff_t stride;
+};
+
+/*One strided view for each argument of j_nu() and alpha_nu() */
+struct batch_inputs
+{
+  struct strided_double nu;
+  struct strided_double magnetic_field;
+  struct strided_double electron_density;
+  struct strided_double observer_angle;
+  struct strided_int    distribution;
+  struct strided_int    polarization;
+  struct strided_double theta_e;
+  struct strided_double power_law_p;
+  struct strided_double gamma_min;
+  struct strided_double gamma_max;
+  struct strided_double gamma_cutoff;
+  struct strided_double kappa;
+  struct strided_double kappa_width;
+};
+
+/*Called after each element of a batch with the number of elements done so
+  far, the total count, and the caller's data pointer; a nonzero return
+  value cancels the remaining elements (see
+  symphony_integrate_batch_progress()). */
+typedef int (*batch_progress_function)(size_t done, size_t count,
+                                       void *data);
+
+size_t symphony_integrate_batch(const struct parameters *template_params,
+                                size_t count,
+                                const struct batch_inputs *inputs,
+                                double *out,
+                                ptrdiff_t out_stride,
+                                char **error_message);
+size_t symphony_integrate_batch_progress(
+                                const struct parameters *template_params,
+                                size_t count,
+                                const struct batch_inputs *inputs,
+                                double *out,
+                                ptrdiff_t out_stride,
+                                batch_progress_function progress,
+                                void *progress_data,
+                                size_t *done,
+                                char **error_message);
+size_t j_nu_batch(size_t count,
+                  const struct batch_inputs *inputs,
+                  double *out,
+                  ptrdiff_t out_stride,
+                  char **error_message);
+size_t alpha_nu_batch(size_t count,
+                      const struct batch_inputs *inputs,
+                      double *out,
+                      ptrdiff_t out_stride,
+                      char **error_message);
+
+#endif /* SYMPHONY_BATCH_H_ */
@@ -0,0 +1,354 @@
+/* Symphony
+ *
+ * benchmark: times the gamma integrand at individual quadrature nodes (the
+ * self-contained gamma_integrand(), which dispatches on the mode and Stokes
+ * parameter at every node, as a baseline, and the integrand of the
+ * evaluation plan used by the integrator) and complete calls to j_nu() and
+ * alpha_nu() for each distribution, Stokes
+ * parameter and mode, at the sample parameters of symphony_tests.py,
+ * compares Stokes V to the expected values in symphony_tests.py, counts the
+ * gamma integrals of the n integral past n_max with QAG and with the
+ * Chebyshev surrogate, and times single calls with n_threads = 0, 1, 2, 4
+ * and 8.
+ *
+ * Usage: benchmark [calls per case]
+ */
+
+#define _POSIX_C_SOURCE 199309L
+
+#include <stdlib.h>
+#include <time.h>
+#include "symphony.h"
+#include "params.h"
+#include "integrator/integrands.h"
+
+/* seconds: wall clock time in seconds */
+static double seconds(void)
+{
+  struct timespec now;
+  clock_gettime(CLOCK_MONOTONIC, &now);
+  return now.tv_sec + 1.e-9 * now.tv_nsec;
+}
+
+/* set_sample_params: the sample parameters used in symphony_tests.py */
+static void set_sample_params(struct parameters *params, int distribution,
+                              int polarization, int mode)
+{
+  setConstParams(params);
+
+  params->magnetic_field   = 30.;
+  params->electron_density = 1.;
+  params->observer_angle   = params->pi/3.;
+  params->nu               = 230.e9;
+  params->distribution     = distribution;
+  params->polarization     = polarization;
+  params->mode             = mode;
+  params->theta_e          = 10.;
+  params->power_law_p      = 2.5;
+  params->gamma_min        = 1.;
+  params->gamma_max        = 1000.;
+  params->gamma_cutoff     = 1e10;
+  params->kappa            = 3.5;
+  params->kappa_width      = 10.;
+  params->stokes_v_switch  = -1;
+
+  set_distribution_function(params);
+}
+
+/* ns_per_node: average time of one evaluation of the gamma integrand over
+ *              the resonance range of the last harmonic of the n sum, with
+ *              the integrand of the evaluation plan or (planned = 0) with
+ *              gamma_integrand() */
+static double ns_per_node(struct parameters *params, int nodes, int planned)
+{
+  struct parametersGSL paramsGSL;
+  double sum = 0.;
+  double (*integrand)(double gamma, void *paramsGSL) = &gamma_integrand;
+
+  set_evaluation_plan(params);
+
+  double sin_theta = params->sin_observer_angle;
+  double n_minus   = params->nu / params->nu_c * fabs(sin_theta);
+  double n         = (int)n_minus + params->n_max;
+  double ratio     = n * params->nu_c / params->nu;
+  double root      = fabs(params->cos_observer_angle)
+                     * sqrt(ratio*ratio - sin_theta*sin_theta);
+
+  paramsGSL.params = *params;
+  paramsGSL.n      = n;
+
+  if (planned) integrand = params->gamma_integrand_function;
+
+  double gamma_lo = (ratio - root) / (sin_theta*sin_theta);
+  double gamma_hi = (ratio + root) / (sin_theta*sin_theta);
+
+  double start = seconds();
+  for (int i = 0; i < nodes; i++)
+  {
+    double gamma = gamma_lo + (gamma_hi - gamma_lo) * (i + 0.5) / nodes;
+    sum += integrand(gamma, &paramsGSL);
+  }
+  double elapsed = seconds() - start;
+
+  /* keep the compiler from discarding the loop */
+  if (sum == 1.234567e89) printf("%e", sum);
+
+  return 1.e9 * elapsed / nodes;
+}
+
+/* counting_integrand: the gamma integrand of the evaluation plan, counting
+ *                     its evaluations and the gamma integrals (changes of
+ *                     the harmonic number n) */
+static double (*plan_integrand)(double gamma, void *paramsGSL);
+static long   integrand_nodes;
+static long   gamma_integrals;
+static double last_n;
+
+static double counting_integrand(double gamma, void *paramsGSL)
+{
+  struct parametersGSL *p = (struct parametersGSL *) paramsGSL;
+
+  integrand_nodes++;
+  if (p->n != last_n)
+  {
+    gamma_integrals++;
+    last_n = p->n;
+  }
+
+  return plan_integrand(gamma, paramsGSL);
+}
+
+/* n_integral_cost: the n integral past n_max, as done by n_summation(),
+ *                  with QAG or the Chebyshev surrogate; stores its value,
+ *                  the number of gamma integrals and integrand evaluations
+ *                  and returns the time in us */
+static double n_integral_cost(struct parameters *params, int use_n_surrogate,
+                              double *value, long *gammas, long *nodes)
+{
+  params->use_n_surrogate = use_n_surrogate;
+  params->stokes_v_switch = -1;
+
+  set_evaluation_plan(params);
+  plan_integrand                   = params->gamma_integrand_function;
+  params->gamma_integrand_function = &counting_integrand;
+
+  double n_minus = params->nu / params->nu_c
+                   * fabs(params->sin_observer_angle);
+
+  integrand_nodes = 0;
+  gamma_integrals = 0;
+  last_n          = 0.;
+
+  gsl_error_handler_t *prev_handler = gsl_set_error_handler_off();
+
+  double start = seconds();
+  *value = n_integration(n_minus, params->n_peak, params);
+  double elapsed = seconds() - start;
+
+  gsl_set_error_handler(prev_handler);
+
+  *gammas = gamma_integrals;
+  *nodes  = integrand_nodes;
+
+  return 1.e6 * elapsed;
+}
+
+/* us_per_threaded_call: average time of one call to symphony_integrate()
+ *                       with params->n_threads threads; the result of the
+ *                       call is stored in *value */
+static double us_per_threaded_call(struct parameters *params, int calls,
+                                   double *value)
+{
+  char *error_message = NULL;
+
+  double start = seconds();
+  for (int i = 0; i < calls; i++)
+  {
+    *value = symphony_integrate(params, &error_message);
+
+    if (error_message != NULL)
+    {
+      printf("\nerror: %s", error_message);
+      free(error_message);
+      error_message = NULL;
+    }
+  }
+  double elapsed = seconds() - start;
+
+  return 1.e6 * elapsed / calls;
+}
+
+/* us_per_call: average time of one call to j_nu() or alpha_nu() */
+static double us_per_call(struct parameters *params, int calls)
+{
+  char *error_message = NULL;
+  double (*coefficient)(double, double, double, double, int, int, double,
+                        double, double, double, double, double, double,
+                        char **);
+
+  coefficient = (params->mode == params->EMISSIVITY) ? &j_nu : &alpha_nu;
+
+  double start = seconds();
+  for (int i = 0; i < calls; i++)
+  {
+    coefficient(params->nu, params->magnetic_field, params->electron_density,
+                params->observer_angle, params->distribution,
+                params->polarization, params->theta_e, params->power_law_p,
+                params->gamma_min, params->gamma_max, params->gamma_cutoff,
+                params->kappa, params->kappa_width, &error_message);
+  }
+  double elapsed = seconds() - start;
+
+  if (error_message != NULL)
+  {
+    printf("\nerror: %s", error_message);
+    free(error_message);
+  }
+
+  return 1.e6 * elapsed / calls;
+}
+
+int main(int argc, char *argv[])
+{
+  struct parameters params;
+  setConstParams(&params);
+
+  int calls = 10;
+  int nodes = 1000000;
+
+  if (argc > 1) calls = atoi(argv[1]);
+
+  int distributions[3]  = {params.MAXWELL_JUETTNER, params.POWER_LAW,
+                           params.KAPPA_DIST};
+  const char *dist_names[3] = {"MAXWELL_JUETTNER", "POWER_LAW", "KAPPA_DIST"};
+  int polarizations[3]  = {params.STOKES_I, params.STOKES_Q, params.STOKES_V};
+  const char *pol_names[3]  = {"I", "Q", "V"};
+  int modes[2]          = {params.EMISSIVITY, params.ABSORPTIVITY};
+  const char *mode_names[2] = {"j_nu", "alpha_nu"};
+
+  printf("distribution      stokes  mode        ns/node (baseline, plan)"
+         "     us/call");
+
+  for (int d = 0; d < 3; d++)
+  {
+    for (int p = 0; p < 3; p++)
+    {
+      for (int m = 0; m < 2; m++)
+      {
+        set_sample_params(&params, distributions[d], polarizations[p],
+                          modes[m]);
+
+        double baseline = ns_per_node(&params, nodes, 0);
+        double node     = ns_per_node(&params, nodes, 1);
+        double call     = us_per_call(&params, calls);
+
+        printf("\n%-16s  %-6s  %-10s  %9.1f  %9.1f      %10.1f",
+               dist_names[d], pol_names[p], mode_names[m], baseline, node,
+               call);
+      }
+    }
+  }
+
+  /* expected Stokes V values from symphony_tests.py, for j_nu() and
+     alpha_nu() of each distribution, negated: symphony_tests.py lists
+     them with the opposite sign to the IEEE/IAU convention of
+     polarization_term(), which j_nu() and alpha_nu() follow */
+  double stokes_v_expected[3][2] = {{2.7138066784e-24,  2.81581615428e-21},
+                                    {3.86129355636e-26, 4.27534148958e-23},
+                                    {3.84237974681e-24, 1.66592280833e-21}};
+
+  printf("\n\ndistribution      mode        STOKES_V        expected"
+         "        rel. diff   us/call");
+
+  for (int d = 0; d < 3; d++)
+  {
+    for (int m = 0; m < 2; m++)
+    {
+      char *error_message = NULL;
+
+      set_sample_params(&params, distributions[d], params.STOKES_V,
+                        modes[m]);
+
+      double value = symphony_integrate(&params, &error_message);
+      double call  = us_per_call(&params, calls);
+
+      if (error_message != NULL) free(error_message);
+
+      printf("\n%-16s  %-10s  %e  %e  %9.2e  %8.1f", dist_names[d],
+             mode_names[m], value, stokes_v_expected[d][m],
+             fabs(value - stokes_v_expected[d][m])
+             / fabs(stokes_v_expected[d][m]), call);
+    }
+  }
+
+  /* cost of the n integral past n_max (Stokes I, j_nu) with the adaptive
+     QAG steps of n_integration() and with the Chebyshev surrogate, at the
+     sample frequency and 1000 times higher */
+  double nus[2] = {230.e9, 230.e12};
+
+  printf("\n\ndistribution      nu/nu_c    method     gamma integrals"
+         "    nodes        us    rel. diff");
+
+  for (int d = 0; d < 3; d++)
+  {
+    for (int f = 0; f < 2; f++)
+    {
+      double value[2], us[2];
+      long   gammas[2], nodes[2];
+
+      for (int surrogate = 0; surrogate < 2; surrogate++)
+      {
+        set_sample_params(&params, distributions[d], params.STOKES_I,
+                          params.EMISSIVITY);
+        params.nu = nus[f];
+
+        us[surrogate] = n_integral_cost(&params, surrogate, &value[surrogate],
+                                        &gammas[surrogate], &nodes[surrogate]);
+      }
+
+      for (int surrogate = 0; surrogate < 2; surrogate++)
+      {
+        printf("\n%-16s  %9.2e  %-9s  %15ld  %9ld  %8.0f  %9.2e",
+               dist_names[d], params.nu / params.nu_c,
+               surrogate ? "surrogate" : "QAG", gammas[surrogate],
+               nodes[surrogate], us[surrogate],
+               fabs(value[surrogate] - value[0]) / fabs(value[0]));
+      }
+    }
+  }
+
+  /* latency of a single call against the number of threads.  Every
+     n_threads >= 1 must reproduce the n_threads = 1 result exactly; the
+     serial path (n_threads = 0) uses QAG for the n integral and agrees
+     within the integration tolerance */
+  int threads[5] = {0, 1, 2, 4, 8};
+
+  printf("\n\ndistribution      stokes  mode        n_threads   us/call"
+         "   diff. from n_threads = 1");
+
+  for (int d = 0; d < 3; d++)
+  {
+    double value, reference;
+
+    set_sample_params(&params, distributions[d], params.STOKES_I,
+                      params.EMISSIVITY);
+    params.n_threads = 1;
+    us_per_threaded_call(&params, 1, &reference);
+
+    for (int t = 0; t < 5; t++)
+    {
+      set_sample_params(&params, distributions[d], params.STOKES_I,
+                        params.EMISSIVITY);
+      params.n_threads = threads[t];
+
+      double call = us_per_threaded_call(&params, calls, &value);
+
+      printf("\n%-16s  %-6s  %-10s  %9d  %8.1f  %e", dist_names[d], "I",
+             "j_nu", threads[t], call, value - reference);
+    }
+  }
+
+  printf("\n");
+
+  return 0;
+}
@@ -57,6 +57,25 @@ double exp_factor(  double f_factor, double f_exp )  ;
 
 ******************************************************************************************/
 double my_Bessel_dJ( double n, double x) 
+{
+  double bessel_func, bessel_deriv;
+  void my_Bessel_J_and_dJ( double n, double x, double *J, double *dJ ) ;
+
+  my_Bessel_J_and_dJ( n, x, &bessel_func, &bessel_deriv );
+  return( bessel_deriv );
+}
+
+/******************************************************************************************/
+/******************************************************************************************
+   my_Bessel_J_and_dJ():
+   ----------------
+
+       -- returns both J_n(x) (in *J) and its derivative (in *dJ), using the same
+          recurrence relation as my_Bessel_dJ();
+       -- the gamma integrand needs both, and this evaluates J_n(x) only once.
+
+******************************************************************************************/
+void my_Bessel_J_and_dJ( double n, double x, double *J, double *dJ ) 
 {
   double jnp1;
   double my_Bessel_J( double n, double x ) ;
@@ -64,27 +83,29 @@ double my_Bessel_dJ( double n, double x)
   
   bessel_func  = my_Bessel_J(   n,   x );
   jnp1 = my_Bessel_J( (n+1), x );
+  *J = bessel_func;
 #if FLAG_JNprime_EQ == JNprime_EQ1
   // **** problem: how about if n is between 0 and 1?
   if(x == 0.) {
-    if(n >= 2.) return(0.); /* J_n(0) = 0 for n >= 1, then the recursive relation gives
-                             * a zero derivative for n >= 2 */
-    if(n == 0.) return(-jnp1); /* d(J_0(z))/dz = -J_1(z) */
-    return( (n*bessel_func)/(x+DBL_MIN) - jnp1 );
+    if(n >= 2.) { *dJ = 0.; return; } /* J_n(0) = 0 for n >= 1, then the recursive relation gives
+                                       * a zero derivative for n >= 2 */
+    if(n == 0.) { *dJ = -jnp1; return; } /* d(J_0(z))/dz = -J_1(z) */
+    *dJ = (n*bessel_func)/(x+DBL_MIN) - jnp1;
+    return;
   }
-  return( n*(bessel_func)/x - jnp1 );
+  *dJ = n*(bessel_func)/x - jnp1;
 #elif FLAG_JNprime_EQ == JNprime_EQ2
   double jnm1 = my_Bessel_J( (n-1), x );
 
   // **** problem: how about if n is between 0 and 1?
   if(x == 0.) {
-    if(n >= 2.) return(0.); /* J_n(0) = 0 for n >= 1, then the recursive relation gives
-                             * a zero derivative for n >= 2 */
-    if(n == 0.) return(-jnp1); /* d(J_0(z))/dz = -J_1(z) */
+    if(n >= 2.) { *dJ = 0.; return; } /* J_n(0) = 0 for n >= 1, then the recursive relation gives
+                                       * a zero derivative for n >= 2 */
+    if(n == 0.) { *dJ = -jnp1; return; } /* d(J_0(z))/dz = -J_1(z) */
   }
 
   /*  2 d(J_n(z))/dz = J_{n-1}(z) - J_{n+1)(z) */
-  return( 0.5*(jnm1-jnp1) );
+  *dJ = 0.5*(jnm1-jnp1);
 #endif
 }
 
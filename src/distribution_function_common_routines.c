@@ -78,13 +78,19 @@ double analytic_differential_of_f(double gamma, struct parameters * params)
   return prefactor * Df;
 }
 
-double numerical_differential_of_f(double gamma, struct parameters * params)
+/*differential_of_f_prefactor: prefactor of the differential operator
+ *                             ([1] eq. 13) multiplying d/dgamma f, including
+ *                             the 2*pi from integrating out the gyrophase phi
+ *                             and the m^3 c^3 from changing d^3p to
+ *                             dgamma dcos(xi).  It does not depend on gamma,
+ *                             so set_evaluation_plan() folds it into the
+ *                             prefactor of the absorptivity integrand.
+ *
+ *@params: struct of parameters params
+ *@returns: prefactor of the numerical differential of f
+ */
+double differential_of_f_prefactor(struct parameters * params)
 {
-  /*this is "d^3p Df" from [1] eq. 12 and 13.*/ 
-
-  double Df = 0.;
-  double epsilon = 3e-4;
-
   /*all of the distribution functions used are independent of gyrophase
     phi, so integrate out dphi to get 2*pi */
   double gyrophase_indep =  2. * params->pi;
@@ -101,31 +107,47 @@ double numerical_differential_of_f(double gamma, struct parameters * params)
                          *params->speed_light*params->speed_light))
                      * gyrophase_indep
                      * d3p_to_dgamma;
- 
+
+  return prefactor;
+}
+
+/*numerical_Df: finite difference approximation of d/dgamma of the
+ *              distribution function, which evaluates the distribution
+ *              function at gamma+epsilon and gamma-epsilon only once each.
+ *
+ *@params: Lorentz factor gamma, struct of parameters params
+ *@returns: d/dgamma of the distribution function, without the prefactor
+ *          returned by differential_of_f_prefactor()
+ */
+double numerical_Df(double gamma, struct parameters * params)
+{
+  double epsilon = 3e-4;
+
+  double f_plus  = params->distribution_function(gamma+epsilon, params);
+  double f_minus = params->distribution_function(gamma-epsilon, params);
+
   /*The if statements below are necessary because for some values of
     gamma, the quantity distribution_function(gamma+epsilon) or
     distribution_function(gamma-epsilon) is complex, and returns
     NaN.  The if statements use a one-sided approximation to avoid
     these regions. */
-  if(isnan(params->distribution_function(gamma+epsilon, params)) != 0)
-  {
-    Df =  (params->distribution_function(gamma, params)
-           - params->distribution_function(gamma-epsilon, params))
-          / (epsilon);
-  }
-  else if(isnan(params->distribution_function(gamma-epsilon, params)) != 0)
+  if(isnan(f_plus) != 0)
   {
-    Df =  (params->distribution_function(gamma+epsilon, params)
-           - params->distribution_function(gamma, params))
-          / (epsilon);
+    return (params->distribution_function(gamma, params) - f_minus)
+           / (epsilon);
   }
-  else
+  else if(isnan(f_minus) != 0)
   {
-    Df =  (params->distribution_function(gamma+epsilon, params)
-           - params->distribution_function(gamma-epsilon, params))
-          / (2. * epsilon);
+    return (f_plus - params->distribution_function(gamma, params))
+           / (epsilon);
   }
 
-  return prefactor * Df;
+  return (f_plus - f_minus) / (2. * epsilon);
 }
 
+double numerical_differential_of_f(double gamma, struct parameters * params)
+{
+  /*this is "d^3p Df" from [1] eq. 12 and 13.*/ 
+
+  return differential_of_f_prefactor(params) * numerical_Df(gamma, params);
+}
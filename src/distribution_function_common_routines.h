@@ -12,6 +12,8 @@ double normalize_f(double (*distribution)(double, void *),
                   );
 
 double numerical_differential_of_f(double gamma, struct parameters * params);
+double differential_of_f_prefactor(struct parameters * params);
+double numerical_Df(double gamma, struct parameters * params);
 double analytic_differential_of_f(double gamma, struct parameters * params);
 
 //#endif /* SYMPHONY_DISTRIBUTION_FUNCTION_COMMON_ROUTINES_H_ */
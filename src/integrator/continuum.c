@@ -0,0 +1,285 @@
+#include "continuum.h"
+
+/*continuum limit of the emissivity and absorptivity: for nu >> nu_c the
+  harmonics are so closely spaced that the sum over n can be replaced by
+  an integral, and for gamma >> 1 the emission of each electron is beamed
+  along its velocity, so that only electrons with pitch angle equal to
+  the observer angle contribute.  The emission of each electron is then
+  given by the synchrotron functions F(x) = x int_x^inf K_{5/3} (Stokes I)
+  and G(x) = x K_{2/3}(x) (Stokes Q) of x = nu/nu_crit, with
+  nu_crit = (3/2) nu_c gamma^2 sin(observer_angle) (Rybicki & Lightman
+  1979, ch. 6), and the remaining integral over the distribution function
+  is one dimensional. */
+
+struct parametersContinuum
+{
+  struct parameters * params;
+  int error_weight; /* weight the integrand by 1/(gamma sin(theta))^2 */
+};
+
+/*number_density_per_gamma: N(gamma), the number density of electrons per
+ *                          unit Lorentz factor, for the (isotropic)
+ *                          distribution function of params; the
+ *                          distribution function is per unit d^3p.
+ *
+ *@params: Lorentz factor gamma, struct of parameters params
+ *@returns: N(gamma) = 4 pi m^3 c^3 gamma^2 beta f(gamma)
+ */
+static double number_density_per_gamma(double gamma,
+                                       struct parameters * params)
+{
+  double beta = sqrt(1. - 1./(gamma*gamma));
+
+  return 4. * params->pi * pow(params->mass_electron * params->speed_light, 3.)
+         * gamma*gamma * beta * params->distribution_function(gamma, params);
+}
+
+/*differential_of_N: gamma^2 d/dgamma (N(gamma)/gamma^2), the term in the
+ *                   continuum absorptivity (eq. 6.52 of Rybicki & Lightman
+ *                   1979, written in gamma) that depends on the
+ *                   distribution function.  Evaluated numerically, with
+ *                   the same step and one-sided fallbacks as
+ *                   numerical_differential_of_f(), so that it works for
+ *                   any isotropic distribution function.
+ *
+ *@params: Lorentz factor gamma, struct of parameters params
+ *@returns: gamma^2 d/dgamma (N(gamma)/gamma^2)
+ */
+static double differential_of_N(double gamma, struct parameters * params)
+{
+  double epsilon = 3e-4;
+
+  double plus   = number_density_per_gamma(gamma + epsilon, params)
+                  / ((gamma + epsilon) * (gamma + epsilon));
+  double minus  = number_density_per_gamma(gamma - epsilon, params)
+                  / ((gamma - epsilon) * (gamma - epsilon));
+  double center = number_density_per_gamma(gamma, params)/(gamma*gamma);
+
+  double D = 0.;
+
+  if(isnan(plus) != 0)       D = (center - minus)/epsilon;
+  else if(isnan(minus) != 0) D = (plus - center)/epsilon;
+  else                       D = (plus - minus)/(2. * epsilon);
+
+  return gamma * gamma * D;
+}
+
+/*continuum_integrand: integrand of the continuum emissivity or absorptivity
+ *                     in u = log(gamma), without the prefactors applied in
+ *                     continuum_result().
+ *
+ *@params: u = log(gamma), void pointer to struct parametersContinuum
+ *@returns: gamma * N(gamma) * F(x) (or G(x) for Stokes Q) for the
+ *          emissivity, gamma * F(x) * gamma^2 d/dgamma (N/gamma^2) for
+ *          the absorptivity; if error_weight is set, the absolute value
+ *          of this times 1/(gamma sin(theta))^2.
+ */
+static double continuum_integrand(double u, void * paramsInput)
+{
+  struct parametersContinuum * paramsContinuum
+    = (struct parametersContinuum*) paramsInput;
+  struct parameters * params = paramsContinuum->params;
+
+  double gamma     = exp(u);
+  double sin_theta = params->sin_observer_angle;
+  double nu_c      = params->nu_c;
+
+  double x = params->nu / (1.5 * nu_c * gamma*gamma * sin_theta);
+
+  /*F(x) and G(x) fall off as exp(-x); avoid GSL underflow errors */
+  if (x > 600.) return 0.;
+
+  double kernel = 0.;
+
+  if (params->polarization == params->STOKES_Q)
+    kernel = gsl_sf_synchrotron_2(x);
+  else
+    kernel = gsl_sf_synchrotron_1(x);
+
+  double ans = 0.;
+
+  if (params->mode == params->EMISSIVITY)
+  {
+    ans = gamma * number_density_per_gamma(gamma, params) * kernel;
+  }
+  else if (params->mode == params->ABSORPTIVITY)
+  {
+    ans = gamma * differential_of_N(gamma, params) * kernel;
+  }
+
+  if (isfinite(ans) == 0) return 0.;
+
+  if (paramsContinuum->error_weight == 1)
+    return fabs(ans) / (gamma*gamma * sin_theta*sin_theta);
+
+  return ans;
+}
+
+/*coarse_error_estimate: cheap version of the error estimate of
+ *                       continuum_result(), from an 8-point
+ *                       Gauss-Legendre rule per decade of gamma (80
+ *                       points for Maxwell-Juettner), with each
+ *                       evaluation of the integrand shared by both
+ *                       integrals.  Used to reject the continuum limit
+ *                       before doing the accurate integrals.
+ *
+ *@params: void pointer to struct parametersContinuum paramsContinuum,
+ *         range gamma_low to gamma_high of the integral over gamma
+ *@returns: estimated relative error of the continuum limit, INFINITY if
+ *          the coarse integral vanishes.
+ */
+static double coarse_error_estimate(struct parametersContinuum
+                                      * paramsContinuum,
+                                    double gamma_low, double gamma_high)
+{
+  double sin_theta = paramsContinuum->params->sin_observer_angle;
+
+  gsl_integration_glfixed_table * table
+    = gsl_integration_glfixed_table_alloc(8);
+
+  double integral = 0.;
+  double weighted = 0.;
+
+  paramsContinuum->error_weight = 0;
+
+  for (double u_min = log(gamma_low); u_min < log(gamma_high);
+       u_min += log(10.))
+  {
+    double u_max = fmin(u_min + log(10.), log(gamma_high));
+
+    for (size_t i = 0; i < table->n; i++)
+    {
+      double u, weight;
+      gsl_integration_glfixed_point(u_min, u_max, i, &u, &weight, table);
+
+      double value       = continuum_integrand(u, paramsContinuum);
+      double gamma_sin   = exp(u) * sin_theta;
+
+      integral += weight * value;
+      weighted += weight * fabs(value) / (gamma_sin*gamma_sin);
+    }
+  }
+
+  gsl_integration_glfixed_table_free(table);
+
+  if (integral == 0.) return INFINITY;
+
+  return weighted/fabs(integral);
+}
+
+/*continuum_result: emissivity or absorptivity (Stokes I or Q) in the
+ *                  continuum limit described above, together with an
+ *                  estimate of its relative error.  The continuum limit
+ *                  neglects terms of order 1/gamma^2 (beta = 1) and
+ *                  1/(gamma sin(theta))^2 (beaming), so the error estimate
+ *                  is the average of 1/(gamma sin(theta))^2 over the
+ *                  integrand, plus the relative error of the quadrature.
+ *                  For the test problem of symphony_tests.py (nu/nu_c ~
+ *                  3e3) this estimate is ~5e-4, and the continuum results
+ *                  differ from the exact ones by ~1e-3.  The integral over
+ *                  gamma is done in decades of gamma using GSL's QAG
+ *                  integrator, unless coarse_error_estimate() already
+ *                  exceeds twice continuum_tolerance; the continuum limit
+ *                  is then not usable, and 0 is returned with the coarse
+ *                  estimate at a fraction of the cost.
+ *
+ *@params: struct of parameters params, pointer error_estimate to store the
+ *         estimated relative error
+ *@returns: continuum limit of j_nu or alpha_nu.
+ */
+double continuum_result(struct parameters * params, double * error_estimate)
+{
+  /*continuum_integrand() takes nu_c and sin(theta) from the evaluation
+    plan; set it up on a copy of params, so that this can also be called
+    on its own */
+  struct parameters planned_params = *params;
+  set_evaluation_plan(&planned_params);
+
+  double nu_c      = planned_params.nu_c;
+  double sin_theta = planned_params.sin_observer_angle;
+
+  double gamma_low  = 1.;
+  double gamma_high = 1.e10;
+
+  if (params->distribution == params->POWER_LAW)
+  {
+    gamma_low  = params->gamma_min;
+    gamma_high = params->gamma_max;
+  }
+
+  struct parametersContinuum paramsContinuum;
+  paramsContinuum.params = &planned_params;
+
+  double coarse_error = coarse_error_estimate(&paramsContinuum,
+                                              gamma_low, gamma_high);
+
+  if (coarse_error > 2. * params->continuum_tolerance)
+  {
+    *error_estimate = coarse_error;
+    return 0.;
+  }
+
+  /*QAG failing to converge shows up in the error estimate instead */
+  gsl_error_handler_t *prev_handler = gsl_set_error_handler_off();
+
+  gsl_integration_workspace * w = gsl_integration_workspace_alloc (5000);
+
+  /* Integrator parameters */
+  double absolute_error  = 0.;
+  double relative_error  = 1.e-6;
+  size_t limit           = 1000;
+  int gauss_kronrod_rule = 3;
+
+  gsl_function F;
+  F.function = &continuum_integrand;
+  F.params   = &paramsContinuum;
+
+  double integral     = 0.;
+  double weighted     = 0.;
+  double quadrature   = 0.;
+
+  for (double u_min = log(gamma_low); u_min < log(gamma_high);
+       u_min += log(10.))
+  {
+    double u_max = fmin(u_min + log(10.), log(gamma_high));
+    double result, error;
+
+    paramsContinuum.error_weight = 0;
+    gsl_integration_qag(&F, u_min, u_max, absolute_error, relative_error,
+                        limit, gauss_kronrod_rule, w, &result, &error);
+    integral   += result;
+    quadrature += error;
+
+    paramsContinuum.error_weight = 1;
+    gsl_integration_qag(&F, u_min, u_max, absolute_error, relative_error,
+                        limit, gauss_kronrod_rule, w, &result, &error);
+    weighted   += result;
+  }
+
+  gsl_integration_workspace_free (w);
+  gsl_set_error_handler(prev_handler);
+
+  if (integral == 0.)
+  {
+    *error_estimate = INFINITY;
+    return 0.;
+  }
+
+  *error_estimate = (weighted + quadrature)/fabs(integral);
+
+  /*sqrt(3) e^3 B sin(theta) / (4 pi m c^2), written in terms of nu_c */
+  double prefactor = sqrt(3.) * params->electron_charge
+                     * params->electron_charge * nu_c * sin_theta
+                     / (2. * params->speed_light);
+
+  /*Stokes Q is negative in the convention of polarization_term() */
+  if (params->polarization == params->STOKES_Q) prefactor = -prefactor;
+
+  if (params->mode == params->ABSORPTIVITY)
+  {
+    return - prefactor * integral
+           / (2. * params->mass_electron * params->nu * params->nu);
+  }
+
+  return prefactor * integral;
+}
@@ -0,0 +1,11 @@
+#ifndef SYMPHONY_CONTINUUM_H_
+#define SYMPHONY_CONTINUUM_H_
+
+#include <gsl/gsl_integration.h>
+#include <gsl/gsl_errno.h>
+#include <gsl/gsl_sf_synchrotron.h>
+#include "../params.h"
+#include "integrands.h"
+
+double continuum_result(struct parameters * params, double * error_estimate);
+#endif /* SYMPHONY_CONTINUUM_H_ */
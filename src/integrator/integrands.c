@@ -1,11 +1,44 @@
 #include "integrands.h"
 
+/*stokes_I_kernel, stokes_Q_kernel, stokes_U_kernel, stokes_V_kernel: the 
+ *                 form of K_S (eq. 4-7 of [1]) for each Stokes parameter,
+ *                 given M, N, J_n(z) and its derivative dJ_n(z)/dz.  The
+ *                 kernel for the requested Stokes parameter is chosen once
+ *                 per call by set_evaluation_plan().
+ */
+static double stokes_I_kernel(double M, double N, double J, double dJ)
+{
+  return M*M * J*J + N*N * dJ*dJ;
+}
+
+static double stokes_Q_kernel(double M, double N, double J, double dJ)
+{
+  return M*M * J*J - N*N * dJ*dJ;
+}
+
+static double stokes_U_kernel(double M, double N, double J, double dJ)
+{
+  return 0.;
+}
+
+static double stokes_V_kernel(double M, double N, double J, double dJ)
+{
+  /*NOTE: The sign in Leung et al. (2011) of this term
+    is different due to an error.  The sign below
+    corresponds to the Stokes V convention described 
+    in Leung et al. and Pandya et al. (2016), namely
+    the IEEE/IAU convention.*/
+  return 2.*M*N*J*dJ;
+}
+
 /*polarization_term: term in the gamma integrand that varies based upon the 
  *                   Stokes parameter; this term is denoted K_S in [1],
  *                   eq. 3 and 12.  The functional form K_S takes is
  *                   described in eq. 4-7 of [1].  This term is a part
  *                   of the gamma integrand, and thus is called by
- *                   gamma_integrand() below. 
+ *                   gamma_integrand() below.  It only depends on the
+ *                   parameters in params, so it can be called on its own;
+ *                   the integrator uses planned_polarization_term() below.
  *
  *@params: Lorentz factor gamma, harmonic number n,
  *         struct of parameters params 
@@ -72,12 +105,112 @@ double polarization_term(double gamma, double n,
   return ans;
 }
 
+/*planned_polarization_term: polarization_term() for the integrands of
+ *                           the integrator: the cyclotron frequency, the
+ *                           sine and cosine of the observer angle and the
+ *                           kernel for the Stokes parameter are taken from
+ *                           the evaluation plan (see set_evaluation_plan()
+ *                           below), which must be set.
+ *
+ *@params: Lorentz factor gamma, harmonic number n,
+ *         struct of parameters params 
+ *@returns: K_S, as polarization_term()
+ */
+static double planned_polarization_term(double gamma, double n,
+                                        struct parameters * params)
+{
+  /*below calculation is described in Section 2 of [1]*/
+
+  double beta = sqrt(1. - 1./(gamma*gamma));
+
+  /*xi = the angle between the electron velocity vector and the magnetic
+         field vector */
+  double cos_xi =   (gamma * params->nu - n * params->nu_c)
+		              / ( gamma * params->nu * beta 
+                     * params->cos_observer_angle
+                    );
+
+  double sin_xi = sqrt(1. - cos_xi*cos_xi);
+
+  double M = (params->cos_observer_angle - beta * cos_xi)
+             / params->sin_observer_angle;
+
+  double N = beta * sin_xi;
+
+  double z = (params->nu * gamma * beta * params->sin_observer_angle 
+              * sin_xi)/params->nu_c;
+
+  double J, dJ;
+
+  my_Bessel_J_and_dJ(n, z, &J, &dJ);
+
+  return params->polarization_kernel(M, N, J, dJ);
+}
+
+/*gamma_integrand_emissivity: gamma integrand for j_nu(); with the invariant
+ *                            prefactor (see set_evaluation_plan()) this is
+ *                            
+ *                            (2 pi (e nu)^2 / c) (m c)^3 gamma^2 beta 2 pi
+ *                            f(gamma) K_S / (nu beta |cos(theta)|),
+ *
+ *                            in which the factors of beta cancel.
+ *
+ *@params: Lorentz factor gamma, void pointer to paramsGSLInput 
+ *returns: gamma integrand for the emissivity
+ */
+double gamma_integrand_emissivity(double gamma, void * paramsGSLInput)
+{
+  struct parametersGSL * paramsGSL = (struct parametersGSL*) paramsGSLInput;
+  struct parameters * params       = &(paramsGSL->params);
+
+  double ans = params->gamma_integrand_prefactor * gamma*gamma
+             * params->distribution_function(gamma, params)
+             * planned_polarization_term(gamma, paramsGSL->n, params);
+
+  /*if ans is NaN or inf (usually because of small numerical errors
+    that do not contribute to the integral result) return 0.*/
+  if(isfinite(ans) == 0) return 0.;
+
+  return ans;
+}
+
+/*gamma_integrand_absorptivity: gamma integrand for alpha_nu(); with the
+ *                              invariant prefactor (see set_evaluation_plan())
+ *                              this is
+ *
+ *                              - (c e^2 / (2 nu)) gamma^2 beta
+ *                              d^3p Df K_S / (nu beta |cos(theta)|),
+ *
+ *                              in which the factors of beta cancel.
+ *
+ *@params: Lorentz factor gamma, void pointer to paramsGSLInput 
+ *returns: gamma integrand for the absorptivity
+ */
+double gamma_integrand_absorptivity(double gamma, void * paramsGSLInput)
+{
+  struct parametersGSL * paramsGSL = (struct parametersGSL*) paramsGSLInput;
+  struct parameters * params       = &(paramsGSL->params);
+
+  double ans = params->gamma_integrand_prefactor * gamma*gamma
+             * numerical_Df(gamma, params)
+             * planned_polarization_term(gamma, paramsGSL->n, params);
+
+  /*if ans is NaN or inf (usually because of small numerical errors
+    that do not contribute to the integral result) return 0.*/
+  if(isfinite(ans) == 0) return 0.;
+
+  return ans;
+}
+
 /*gamma_integrand: full gamma integrand (eq. 3, 12 of [1]) with the summation
  *                 moved outside the integral and the delta function evaluated
  *                 by setting eq. 10 of [1] to zero. Also, d^3p is converted
  *                 to coordinates gamma (Lorentz factor), xi (angle between 
  *                 electron velocity vector and magnetic field vector), 
- *                 and phi (gyrophase).
+ *                 and phi (gyrophase).  Like polarization_term(), this only
+ *                 depends on the parameters in params; the integrator uses
+ *                 the integrand chosen for the mode by set_evaluation_plan()
+ *                 instead, which gives the same values.
  *
  *@params: Lorentz factor gamma, 
  *         void pointer to paramsGSLInput (struct of params similar to
@@ -132,6 +265,77 @@ double gamma_integrand(double gamma, void * paramsGSLInput)
 
 }
 
+/*set_evaluation_plan: computes the quantities that are invariant during a
+ *                     call to j_nu() or alpha_nu() (the cyclotron
+ *                     frequency, the sine and cosine of the observer angle
+ *                     and the gamma-independent prefactor of the gamma
+ *                     integrand), and chooses the gamma integrand for the
+ *                     mode and the kernel for the Stokes parameter, so that
+ *                     these are not recomputed at every quadrature node.
+ *                     Must be called again if any user parameter changes.
+ *
+ *@params: struct of parameters params
+ *@returns: sets the evaluation plan in params
+ */
+void set_evaluation_plan(struct parameters * params)
+{
+  params->nu_c               = get_nu_c(*params);
+  params->cos_observer_angle = cos(params->observer_angle);
+  params->sin_observer_angle = sin(params->observer_angle);
+
+  if(params->polarization == params->STOKES_I)
+  {
+    params->polarization_kernel = &stokes_I_kernel;
+  }
+  else if(params->polarization == params->STOKES_Q)
+  {
+    params->polarization_kernel = &stokes_Q_kernel;
+  }
+  else if(params->polarization == params->STOKES_V)
+  {
+    params->polarization_kernel = &stokes_V_kernel;
+  }
+  else
+  {
+    params->polarization_kernel = &stokes_U_kernel;
+  }
+
+  double abs_cos_observer_angle = fabs(params->cos_observer_angle);
+
+  if(params->mode == params->ABSORPTIVITY)
+  {
+    params->gamma_integrand_function  = &gamma_integrand_absorptivity;
+    params->gamma_integrand_prefactor = 
+        - params->speed_light
+        * params->electron_charge * params->electron_charge
+        / (2. * params->nu * params->nu * abs_cos_observer_angle)
+        * differential_of_f_prefactor(params);
+  }
+  else
+  {
+    double electron_charge_nu = params->electron_charge * params->nu;
+    double mass_speed_light   = params->mass_electron * params->speed_light;
+
+    params->gamma_integrand_function  = &gamma_integrand_emissivity;
+    params->gamma_integrand_prefactor = 
+        (2. * params->pi * electron_charge_nu * electron_charge_nu)
+        / params->speed_light
+        * (mass_speed_light * mass_speed_light * mass_speed_light
+           * 2. * params->pi)
+        / (params->nu * abs_cos_observer_angle);
+  }
+
+  /*the distribution functions and BesselJ_Debye_Eps_Exp() fill static
+    caches on their first call; with n_threads > 0 the integrand is
+    evaluated concurrently, so fill them here, before any thread starts,
+    and the threads only ever read them */
+  if(params->n_threads > 0)
+  {
+    params->distribution_function(2., params);
+    BesselJ_Debye_Eps_Exp(1., 1.);
+  }
+}
+
 void set_distribution_function(struct parameters * params)
 {
   if(params->distribution == params->MAXWELL_JUETTNER)
@@ -153,4 +357,10 @@ void set_distribution_function(struct parameters * params)
     params->use_n_peak            = 0;
     params->analytic_differential = differential_of_kappa;
   }
+  else if(params->distribution == params->MIXTURE)
+  {
+    params->distribution_function = &mixture_f;
+    params->use_n_peak            = 0;
+    params->analytic_differential = &differential_of_mixture;
+  }
 }
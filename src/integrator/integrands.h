@@ -5,11 +5,17 @@
 #include "maxwell_juettner/maxwell_juettner.h"
 #include "power_law/power_law.h"
 #include "kappa/kappa.h"
+#include "mixture/mixture.h"
 
 double n_summation(struct parameters *params);
 double gamma_integrand(double gamma, void * paramsInput);
+double gamma_integrand_emissivity(double gamma, void * paramsGSLInput);
+double gamma_integrand_absorptivity(double gamma, void * paramsGSLInput);
+void   set_evaluation_plan(struct parameters * params);
 void   set_distribution_function(struct parameters * params);
 double my_Bessel_J(double n, double z);
 double my_Bessel_dJ(double n, double z);
+void   my_Bessel_J_and_dJ(double n, double z, double *J, double *dJ);
+double BesselJ_Debye_Eps_Exp(double n, double x);
 double gamma_integration_result(double n, void * paramsInput);
 #endif /* SYMPHONY_INTEGRANDS_H_ */
@@ -1,37 +1,131 @@
 #include "integrate.h"
 
-/*gamma_integration_result: integrates gamma_integrand() from gamma_minus to
- *                          gamma_plus (described in section 4.1 of [1]).
- *                          Calls the function gamma_integral() in file
- *                          integrate.c, which is a wrapper for the GSL
- *                          integrator QAG.
+/*quiet_integration: For some of the small contributions to the gamma
+ *                   integral at high nu the integrator will fail to meet
+ *                   the relative error tolerance and will quit the
+ *                   program.  This problem only occurs for portions of the
+ *                   gamma integrand that produce negligible contributions,
+ *                   so in this regime the GSL error handler is turned off
+ *                   around the integrals.  The same phenomenon can occur at
+ *                   small observer angle, typically below 9deg (approx
+ *                   0.15 rad).
+ *
+ *@params: struct of parameters params
+ *@returns: 1 if the GSL error handler is to be turned off, 0 otherwise
+ */
+static int quiet_integration(struct parameters * params)
+{
+  return params->nu/params->nu_c >= 1.e6 || params->observer_angle < 0.15;
+}
+
+/*number_of_threads: number of threads for the parallel loops below; with
+ *                   params->n_threads of 0 or 1 they run on the calling
+ *                   thread.
+ */
+static int number_of_threads(struct parameters * params)
+{
+  return params->n_threads > 1 ? params->n_threads : 1;
+}
+
+/*planned_gamma_integral: gamma_integral() for a params whose evaluation
+ *                        plan is set; integrates the gamma integrand chosen
+ *                        by set_evaluation_plan().
+ *
+ *@params: min (lower bound of integral), max (upper bound of integral),
+ *         n (harmonic number), struct of parameters params
+ *@returns: result of the gamma integral.
+ */
+static double planned_gamma_integral(double min, double max, double n,
+                                     struct parameters * params)
+{
+  struct parametersGSL paramsGSL;
+  paramsGSL.params = *params;
+  paramsGSL.n      = n;
+
+  /*the GSL error handler is global, and these integrals can run in
+    parallel, so the callers turn it off for negligible contributions that
+    fail to meet the tolerance (see quiet_integration()) on the calling
+    thread, before any parallel region*/
+  double result, error;
+
+  gsl_function F;
+  F.function = params->gamma_integrand_function;
+  F.params = &paramsGSL;
+
+  gsl_integration_workspace * w = gsl_integration_workspace_alloc (5000);
+
+  /* Integrator parameters */
+  double absolute_error  = 0.;
+  double relative_error  = 1.e-3; 
+  size_t limit           = 1000; 
+  int gauss_kronrod_rule = 3;
+
+  gsl_integration_qag(&F, min, max, absolute_error, relative_error, limit,
+                      gauss_kronrod_rule,  w, &result, &error);
+
+  gsl_integration_workspace_free (w);
+
+  return result;
+}
+
+/*gamma_integral: evaluates an integral from gamma_minus to gamma_plus
+ *                of the gamma integrand using GSL's QAG integrator.  Like
+ *                gamma_integration_result(), this sets up the evaluation
+ *                plan on a copy of params, so it can be called on its own.
+ *
+ *@params: min (lower bound of integral), max (upper bound of integral),
+ *         n (harmonic number), struct of parameters params to be passed
+ *         to gamma_integrand
+ *@returns: result of the gamma integral.
+ */
+double gamma_integral(double min, 
+                      double max, 
+                      double n,
+                      struct parameters * params
+                     )
+{
+  gsl_error_handler_t *prev_handler = NULL;
+  struct parameters planned_params = *params;
+
+  set_evaluation_plan(&planned_params);
+
+  /*turn off the error handler for negligible contributions that fail to
+    meet the tolerance (see quiet_integration())*/
+  int quiet = quiet_integration(&planned_params);
+  if(quiet) prev_handler = gsl_set_error_handler_off();
+
+  double result = planned_gamma_integral(min, max, n, &planned_params);
+
+  if(quiet) gsl_set_error_handler(prev_handler);
+
+  return result;
+}
+
+/*planned_gamma_integration_result: gamma_integration_result() for a params
+ *                                  whose evaluation plan is set.
  *
  *@params: harmonic number n, 
  *         void pointer to struct of parameters paramsInput
- *@returns: result of integrating the gamma integrand over gamma.  Note that
- *          this still remains to be summed over n.
+ *@returns: result of integrating the gamma integrand over gamma.
  */
-double gamma_integration_result(double n, void * paramsInput)
+static double planned_gamma_integration_result(double n, void * paramsInput)
 {
   struct parameters * params = (struct parameters*) paramsInput;
 
-  double nu_c = get_nu_c(*params);
+  double nu_c = params->nu_c;
+
+  /*n nu_c/nu, sin^2(theta) and |cos(theta)| appear in both roots of
+    the resonance condition (eq. 10 of [1]) */
+  double n_nu_c_over_nu  = (n*nu_c)/params->nu;
+  double sin_squared     = params->sin_observer_angle
+                         * params->sin_observer_angle;
+  double root            = fabs(params->cos_observer_angle)
+                         * sqrt(  n_nu_c_over_nu*n_nu_c_over_nu
+                                - sin_squared);
 
-  double gamma_minus =  
-    (   (n*nu_c)/params->nu - fabs(cos(params->observer_angle))
-      * sqrt(  pow((n*nu_c)/params->nu, 2.)
-             - pow(sin(params->observer_angle), 2.)
-            )
-    )
-    / (pow(sin(params->observer_angle), 2));
+  double gamma_minus = (n_nu_c_over_nu - root) / sin_squared;
 
-  double gamma_plus =  
-    (   (n*nu_c)/params->nu + fabs(cos(params->observer_angle))
-      * sqrt(  pow((n*nu_c)/params->nu, 2.)
-             - pow(sin(params->observer_angle), 2.)
-            )
-    )
-    / (pow(sin(params->observer_angle), 2));
+  double gamma_plus  = (n_nu_c_over_nu + root) / sin_squared;
 
   double result = 0.;
 
@@ -62,25 +156,24 @@ double gamma_integration_result(double n, void * paramsInput)
     In this case, the variable stokes_v_switch takes values 0 for the 
     first lobe and +1 for the second lobe of the sinusoid-like gamma
     integrand. If stokes_v_switch is negative, we do not use the split 
-    technique. */
+    technique.  Only the lobe that is asked for is integrated; the two
+    lobes cover disjoint ranges in gamma, so neither helps to compute the
+    other. */
   if(params->polarization == params->STOKES_V && params->stokes_v_switch >= 0) 
   {
-    double neg_result = gamma_integral(gamma_minus_high, gamma_peak, n, params);
-    double pos_result = gamma_integral(gamma_peak, gamma_plus_high,  n, params);
-
     if (params->stokes_v_switch == 0)
     {
-      result = pos_result;
+      result = planned_gamma_integral(gamma_peak, gamma_plus_high,  n, params);
     }
     else
     {
-      result = neg_result;
+      result = planned_gamma_integral(gamma_minus_high, gamma_peak, n, params);
     }
   }
 
   if (params->polarization != params->STOKES_V || params->stokes_v_switch < 0) 
   {
-    result = gamma_integral(gamma_minus_high, gamma_plus_high, n, params);
+    result = planned_gamma_integral(gamma_minus_high, gamma_plus_high, n, params);
   }
 
   /*GSL QAG sometimes erroneously gives NaN instead of small values; 
@@ -90,6 +183,40 @@ double gamma_integration_result(double n, void * paramsInput)
   return result;
 }
 
+/*gamma_integration_result: integrates gamma_integrand() from gamma_minus to
+ *                          gamma_plus (described in section 4.1 of [1]).
+ *                          Calls the function gamma_integral() in file
+ *                          integrate.c, which is a wrapper for the GSL
+ *                          integrator QAG.  This sets up the evaluation
+ *                          plan (see set_evaluation_plan() in integrands.c)
+ *                          on a copy of params, so it can be called on its
+ *                          own; n_summation() sets up the plan once and
+ *                          uses planned_gamma_integration_result() above.
+ *
+ *@params: harmonic number n, 
+ *         void pointer to struct of parameters paramsInput
+ *@returns: result of integrating the gamma integrand over gamma.  Note that
+ *          this still remains to be summed over n.
+ */
+double gamma_integration_result(double n, void * paramsInput)
+{
+  gsl_error_handler_t *prev_handler = NULL;
+  struct parameters params = *(struct parameters*) paramsInput;
+
+  set_evaluation_plan(&params);
+
+  /*turn off the error handler for negligible contributions that fail to
+    meet the tolerance (see quiet_integration())*/
+  int quiet = quiet_integration(&params);
+  if(quiet) prev_handler = gsl_set_error_handler_off();
+
+  double result = planned_gamma_integration_result(n, &params);
+
+  if(quiet) gsl_set_error_handler(prev_handler);
+
+  return result;
+}
+
 /*n_integration: j_nu() and alpha_nu() are given by an integral over gamma of
  *               an integrand that contains a sum over n; we do the integral 
  *               over gamma and then the sum over n.  For numerical accuracy 
@@ -109,7 +236,7 @@ double n_integration(double n_minus,
                      struct parameters * params
                     )
 {
-  double nu_c = get_nu_c(*params);
+  double nu_c = params->nu_c;
 
   double n_start = (int)(params->n_max + n_minus + 1.);
 
@@ -118,9 +245,19 @@ double n_integration(double n_minus,
     1e1 < nu/nu_c < 1e6, outside which the adaptive procedure works better. */
   if (params->use_n_peak == 1 && params->nu/nu_c < 1e6 && params->nu/nu_c > 1e1)
   {
+    if (params->use_n_surrogate == 1)
+    {
+      return n_surrogate_integral(n_start, params->C * n_peak(params), params);
+    }
+
     double ans = n_integral(n_start, params->C * n_peak(params), params);
     return ans;
   }
+  else if (params->use_n_surrogate == 1)
+  {
+    /*The surrogate finds the n-space peak and the tail by itself. */
+    return n_surrogate_integral(n_start, INFINITY, params);
+  }
   else /*For other distributions, the n-space peak is found adaptively. */
   {
     double ans = 0.;
@@ -173,10 +310,35 @@ double n_summation(struct parameters *params)
     return 0.;
   }
 
+  /*a MIXTURE without any populations has no electrons */
+  if(   params->distribution == params->MIXTURE
+     && params->mixture_weight[params->MAXWELL_JUETTNER] == 0.
+     && params->mixture_weight[params->POWER_LAW]        == 0.
+     && params->mixture_weight[params->KAPPA_DIST]       == 0.)
+  {
+    return 0.;
+  }
+
   double ans = 0.;
 
-  double nu_c    = get_nu_c(*params);
-  double n_minus = (params->nu/nu_c) * fabs(sin(params->observer_angle)); 
+  /*precompute the invariants of this call and choose the gamma integrand */
+  set_evaluation_plan(params);
+
+  double nu_c    = params->nu_c;
+  double n_minus = (params->nu/nu_c) * fabs(params->sin_observer_angle); 
+
+  params->n_integral_error = 0.;
+
+  /*At high harmonic number the sum over n is well approximated by the
+    continuum (synchrotron function) limit, which costs a single integral
+    over gamma; use it if its estimated error is small enough. */
+  if(params->use_continuum == 1 && params->polarization != params->STOKES_V)
+  {
+    double continuum_error;
+    double continuum = continuum_result(params, &continuum_error);
+
+    if(continuum_error < params->continuum_tolerance) return continuum;
+  }
 
   /*Stokes V is hard to resolve; described in the last paragraph of section
     4.2 of [1].  We split the sinusoid-like integrand into a positive and 
@@ -188,11 +350,31 @@ double n_summation(struct parameters *params)
     technique, which is what we do for small n. */
   params->stokes_v_switch = -1;  
 
+  /*The GSL error handler is switched once for the whole call, before the
+    gamma integrals run in parallel (see quiet_integration()) */
+  gsl_error_handler_t *prev_handler = NULL;
+  int quiet = quiet_integration(params);
+  if(quiet) prev_handler = gsl_set_error_handler_off();
+
   /*perform n summation by summing the result of the gamma integral for 
-    each value of n from 1 to n_max*/
-  for (int n=(int)(n_minus+1.); n <= params->n_max + (int)n_minus ; n++) 
+    each value of n from 1 to n_max.  The harmonics are independent, so
+    with params->n_threads > 1 they are integrated in parallel; they are
+    always summed in order, so the result does not depend on the number
+    of threads*/
+  int n_first     = (int)(n_minus+1.);
+  int n_harmonics = (int)(params->n_max + (int)n_minus) - n_first + 1;
+  double harmonics[n_harmonics > 0 ? n_harmonics : 1];
+
+#pragma omp parallel for schedule(dynamic) num_threads(number_of_threads(params)) \
+        if(params->n_threads > 0)
+  for (int k = 0; k < n_harmonics; k++)
+  {
+     harmonics[k] = planned_gamma_integration_result(n_first + k, params);
+  }
+
+  for (int k = 0; k < n_harmonics; k++) 
   {
-     ans += gamma_integration_result(n, params);
+     ans += harmonics[k];
   }
 
   params->stokes_v_switch = 0;
@@ -216,6 +398,8 @@ double n_summation(struct parameters *params)
     n_integral_contrib = n_integration(n_minus, params->n_peak, params); 
     if(isnan(n_integral_contrib) == 0) ans += n_integral_contrib;
   }
+
+  if(quiet) gsl_set_error_handler(prev_handler);
   
   return ans;
 }
@@ -234,58 +418,62 @@ double derivative_of_n(double n_start, struct parameters * params)
   double result;
   double abserr;
 
-  F.function = gamma_integration_result;
+  F.function = planned_gamma_integration_result;
   F.params = params;
 
   gsl_deriv_central(&F, n_start, 1e-8, &result, &abserr);
   return result;
 }
 
-/*gamma_integral: evaluates an integral from gamma_minus to gamma_plus
- *                of the gamma integrand using GSL's QAG integrator.
+/*n_integral: evaluates an integral over the n integrand between two
+ *            limits provided by the adaptive routine in n_integration().
+ *            This is evaluated using GSL's QAG integrator.
  *
  *@params: min (lower bound of integral), max (upper bound of integral),
  *         n (harmonic number), struct of parameters params to be passed
- *         to gamma_integrand
- *@returns: result of the gamma integral.
+ *         to gamma_integration_result
+ *@returns: result of the n integral.
  */
-double gamma_integral(double min, 
-                      double max, 
-                      double n,
-                      struct parameters * params
-                     )
+
+double n_integral(double min,
+                  double max, 
+                  struct parameters * params
+                 )
 {
-  double nu_c = get_nu_c(*params);
   gsl_error_handler_t *prev_handler = NULL;
-  struct parametersGSL paramsGSL;
-  paramsGSL.params = *params;
-  paramsGSL.n      = n;
 
-  /*For some of the small contributions to the gamma integral at high nu
-    the integrator will fail to meet the relative error tolerance and 
-    will quit the program.  This problem only occurs for portions of
-    the gamma integrand that produce negligible contributions, so it 
-    is better to turn off the error handler to prevent it from spontaneously
-    quitting.  The same phenomenon can occur at small observer angle, 
-    typically below 9deg (approx 0.15 rad).*/
-  if(params->nu/nu_c >= 1.e6 || params->observer_angle < 0.15)
+  /*turn off the error handler for negligible contributions that fail to
+    meet the tolerance (see quiet_integration()), also before the parallel
+    regions of n_integral_threaded()*/
+  if(quiet_integration(params))
   {
-     prev_handler = gsl_set_error_handler_off();
+    prev_handler = gsl_set_error_handler_off();
   } 
 
+  if(params->n_threads > 0)
+  {
+    double result = n_integral_threaded(min, max, params);
+
+    if(quiet_integration(params))
+    {
+      gsl_set_error_handler(prev_handler);
+    }
+
+    return result;
+  }
 
   double result, error;
 
   gsl_function F;
-  F.function = &gamma_integrand;
-  F.params = &paramsGSL;
+  F.function = &planned_gamma_integration_result;
+  F.params = params;
 
   gsl_integration_workspace * w = gsl_integration_workspace_alloc (5000);
 
   /* Integrator parameters */
   double absolute_error  = 0.;
-  double relative_error  = 1.e-3; 
-  size_t limit           = 1000; 
+  double relative_error  = 1.e-3;
+  size_t limit           = 1000;
   int gauss_kronrod_rule = 3;
 
   gsl_integration_qag(&F, min, max, absolute_error, relative_error, limit,
@@ -293,67 +481,559 @@ double gamma_integral(double min,
 
   gsl_integration_workspace_free (w);
 
-  if(params->nu/nu_c >= 1.e6 || params->observer_angle < 0.15)
+  if(quiet_integration(params))
   {
-     gsl_set_error_handler(prev_handler);
+    gsl_set_error_handler(prev_handler);
   }
 
   return result;
 }
 
-/*n_integral: evaluates an integral over the n integrand between two
- *            limits provided by the adaptive routine in n_integration().
- *            This is evaluated using GSL's QAG integrator.
+/*31-point Gauss-Kronrod rule of QUADPACK, the rule used by QAG with
+  gauss_kronrod_rule = 3 above: Kronrod abscissae (the odd ones are the
+  15-point Gauss abscissae) and weights on [-1, 1], positive half */
+static const double gk31_x[16] =
+{
+  0.998002298693397060285172840152271, 0.987992518020485428489565718586613,
+  0.967739075679139134257347978784337, 0.937273392400705904307758947710209,
+  0.897264532344081900882509656454496, 0.848206583410427216200648320774217,
+  0.790418501442465932967649294817947, 0.724417731360170047416186054613938,
+  0.650996741297416970533735895313275, 0.570972172608538847537226737253911,
+  0.485081863640239680693655740232351, 0.394151347077563369897207370981045,
+  0.299180007153168812166780024266389, 0.201194093997434522300628303394596,
+  0.101142066918717499027074231447392, 0.000000000000000000000000000000000
+};
+
+static const double gk31_w_gauss[8] =
+{
+  0.030753241996117268354628393577204, 0.070366047488108124709267416450667,
+  0.107159220467171935011869546685869, 0.139570677926154314447804794511028,
+  0.166269205816993933553200860481209, 0.186161000015562211026800561866423,
+  0.198431485327111576456118326443839, 0.202578241925561272880620199967519
+};
+
+static const double gk31_w_kronrod[16] =
+{
+  0.005377479872923348987792051430128, 0.015007947329316122538374763075807,
+  0.025460847326715320186874001019653, 0.035346360791375846222037948478360,
+  0.044589751324764876608227299373280, 0.053481524690928087265343147239430,
+  0.062009567800670640285139230960803, 0.069854121318728258709520077099147,
+  0.076849680757720378894432777482659, 0.083080502823133021038289247286104,
+  0.088564443056211770647275443693774, 0.093126598170825321225486872747346,
+  0.096642726983623678505179907627589, 0.099173598721791959332393173484603,
+  0.100769845523875595044946662617570, 0.101330007014791549017374792767493
+};
+
+/*gk31_nodes: the 31 nodes of the Gauss-Kronrod rule on [min, max], in the
+ *            order expected by gk31_rule(): the center, then the pairs
+ *            center -/+ half_length * gk31_x[j].
+ */
+static void gk31_nodes(double min, double max, double nodes[31])
+{
+  double center      = 0.5 * (min + max);
+  double half_length = 0.5 * (max - min);
+
+  nodes[0] = center;
+
+  for (int j = 0; j < 15; j++)
+  {
+    nodes[2*j + 1] = center - half_length * gk31_x[j];
+    nodes[2*j + 2] = center + half_length * gk31_x[j];
+  }
+}
+
+/*gk31_rule: applies the Gauss-Kronrod rule to the values of the integrand
+ *           at gk31_nodes(), with the error estimate of QUADPACK's qk
+ *           routines.
+ *
+ *@params: min, max (bounds of the interval), values at the nodes, pointers
+ *         error and absolute_deviation to store the error estimate and
+ *         the integral of |f - mean| (resasc in QUADPACK)
+ *@returns: Kronrod estimate of the integral over [min, max].
+ */
+static double gk31_rule(double min, double max, const double values[31],
+                        double * error, double * absolute_deviation)
+{
+  double half_length = 0.5 * (max - min);
+
+  double result_gauss   = values[0] * gk31_w_gauss[7];
+  double result_kronrod = values[0] * gk31_w_kronrod[15];
+  double result_abs     = fabs(result_kronrod);
+
+  for (int j = 0; j < 15; j++)
+  {
+    double pair_sum = values[2*j + 1] + values[2*j + 2];
+
+    if (j % 2 == 1) result_gauss += gk31_w_gauss[j/2] * pair_sum;
+
+    result_kronrod += gk31_w_kronrod[j] * pair_sum;
+    result_abs     += gk31_w_kronrod[j] * (fabs(values[2*j + 1])
+                                           + fabs(values[2*j + 2]));
+  }
+
+  double mean       = 0.5 * result_kronrod;
+  double result_asc = gk31_w_kronrod[15] * fabs(values[0] - mean);
+
+  for (int j = 0; j < 15; j++)
+  {
+    result_asc += gk31_w_kronrod[j] * (  fabs(values[2*j + 1] - mean)
+                                       + fabs(values[2*j + 2] - mean));
+  }
+
+  result_abs *= fabs(half_length);
+  result_asc *= fabs(half_length);
+
+  double err = fabs((result_kronrod - result_gauss) * half_length);
+
+  if (result_asc != 0. && err != 0.)
+  {
+    err = result_asc * fmin(1., pow(200. * err / result_asc, 1.5));
+  }
+  if (result_abs > DBL_MIN / (50. * DBL_EPSILON))
+  {
+    err = fmax(50. * DBL_EPSILON * result_abs, err);
+  }
+
+  *error              = err;
+  *absolute_deviation = result_asc;
+
+  return result_kronrod * half_length;
+}
+
+/*n_integral_threaded: n_integral() for params->n_threads > 0.  This is an
+ *                     adaptive bisection with the same rule, tolerance,
+ *                     interval limit and roundoff and singularity tests as
+ *                     the QAG call in n_integral(), but the 62 integrand
+ *                     values of the two halves of each bisected interval
+ *                     (each a gamma integral) are computed in parallel.
+ *                     The sequence of intervals and the order of all sums
+ *                     do not depend on the number of threads, so neither
+ *                     does the result.
  *
  *@params: min (lower bound of integral), max (upper bound of integral),
- *         n (harmonic number), struct of parameters params to be passed
- *         to gamma_integration_result
+ *         struct of parameters params to be passed to
+ *         gamma_integration_result
  *@returns: result of the n integral.
  */
-
-double n_integral(double min,
-                  double max, 
-                  struct parameters * params
-                 )
+double n_integral_threaded(double min,
+                           double max,
+                           struct parameters * params
+                          )
 {
-  gsl_error_handler_t *prev_handler = NULL;
-  double nu_c = get_nu_c(*params);
-
-  /*For some of the small contributions to the gamma integral at high nu
-    the integrator will fail to meet the relative error tolerance and 
-    will quit the program.  This problem only occurs for portions of
-    the gamma integrand that produce negligible contributions, so it 
-    is better to turn off the error handler to prevent it from spontaneously
-    quitting.  The same phenomenon can occur at small observer angle, 
-    typically below 9deg (approx 0.15 rad).*/
-  if(params->nu/nu_c >= 1.e6 || params->observer_angle < 0.15)
+  /* Integrator parameters, as in n_integral() */
+  double relative_error = 1.e-3;
+  int    limit          = 1000;
+
+  double *lower   = malloc(4 * limit * sizeof(double));
+  double *upper   = lower + limit;
+  double *results = upper + limit;
+  double *errors  = results + limit;
+
+  double nodes[62], values[62];
+  int    intervals = 1;
+
+  /*counts of bisections that did not reduce the error, as in QAG */
+  int roundoff_type1 = 0;
+  int roundoff_type2 = 0;
+  int status         = GSL_SUCCESS;
+  double deviation, deviation1, deviation2;
+
+  lower[0] = min;
+  upper[0] = max;
+
+  gk31_nodes(min, max, nodes);
+
+#pragma omp parallel for schedule(dynamic) num_threads(number_of_threads(params)) \
+        if(params->n_threads > 0)
+  for (int k = 0; k < 31; k++)
   {
-    prev_handler = gsl_set_error_handler_off();
-  } 
+    values[k] = planned_gamma_integration_result(nodes[k], params);
+  }
 
-  double result, error;
+  results[0] = gk31_rule(min, max, values, &errors[0], &deviation);
 
-  gsl_function F;
-  F.function = &gamma_integration_result;
-  F.params = params;
+  double result = results[0];
+  double error  = errors[0];
 
-  gsl_integration_workspace * w = gsl_integration_workspace_alloc (5000);
+  while (error > relative_error * fabs(result) && intervals < limit)
+  {
+    /*bisect the interval with the largest error */
+    int worst = 0;
+    for (int i = 1; i < intervals; i++)
+    {
+      if (errors[i] > errors[worst]) worst = i;
+    }
 
-  /* Integrator parameters */
-  double absolute_error  = 0.;
-  double relative_error  = 1.e-3;
-  size_t limit           = 1000;
-  int gauss_kronrod_rule = 3;
+    double a   = lower[worst];
+    double b   = upper[worst];
+    double mid = 0.5 * (a + b);
 
-  gsl_integration_qag(&F, min, max, absolute_error, relative_error, limit,
-                      gauss_kronrod_rule,  w, &result, &error);
+    gk31_nodes(a, mid, nodes);
+    gk31_nodes(mid, b, nodes + 31);
 
-  gsl_integration_workspace_free (w);
+#pragma omp parallel for schedule(dynamic) num_threads(number_of_threads(params)) \
+        if(params->n_threads > 0)
+    for (int k = 0; k < 62; k++)
+    {
+      values[k] = planned_gamma_integration_result(nodes[k], params);
+    }
 
-  if(params->nu/nu_c >= 1.e6 || params->observer_angle < 0.15)
+    double parent_result = results[worst];
+    double parent_error  = errors[worst];
+
+    upper[worst]     = mid;
+    results[worst]   = gk31_rule(a, mid, values, &errors[worst],
+                                 &deviation1);
+    lower[intervals] = mid;
+    upper[intervals] = b;
+    results[intervals] = gk31_rule(mid, b, values + 31, &errors[intervals],
+                                   &deviation2);
+
+    /*roundoff tests of QAG: the halves reproduce the parent without
+      reducing its error, or increase it */
+    double result12 = results[worst] + results[intervals];
+    double error12  = errors[worst] + errors[intervals];
+
+    if (deviation1 != errors[worst] && deviation2 != errors[intervals])
+    {
+      if (   fabs(parent_result - result12) <= 1.e-5 * fabs(result12)
+          && error12 >= 0.99 * parent_error)
+      {
+        roundoff_type1++;
+      }
+      if (intervals >= 10 && error12 > parent_error) roundoff_type2++;
+    }
+
+    intervals++;
+
+    /*sum in interval order, so that the result is reproducible */
+    result = 0.;
+    error  = 0.;
+    for (int i = 0; i < intervals; i++)
+    {
+      result += results[i];
+      error  += errors[i];
+    }
+
+    if (error <= relative_error * fabs(result)) break;
+
+    if (roundoff_type1 >= 6 || roundoff_type2 >= 20)
+    {
+      status = GSL_EROUND;
+      break;
+    }
+
+    /*the bisected interval is as small as the resolution of doubles */
+    if (  fmax(fabs(a), fabs(b))
+        <= (1. + 100. * DBL_EPSILON) * (fabs(mid) + 1000. * DBL_MIN))
+    {
+      status = GSL_ESING;
+      break;
+    }
+  }
+
+  free(lower);
+
+  if (status == GSL_EROUND)
   {
-    gsl_set_error_handler(prev_handler);
+    gsl_error("roundoff error prevents tolerance from being achieved",
+              __FILE__, __LINE__, GSL_EROUND);
+  }
+  else if (status == GSL_ESING)
+  {
+    gsl_error("bad integrand behavior found in the integration interval",
+              __FILE__, __LINE__, GSL_ESING);
+  }
+  else if (error > relative_error * fabs(result))
+  {
+    gsl_error("number of iterations was insufficient", __FILE__, __LINE__,
+              GSL_EMAXITER);
   }
 
   return result;
 }
+
+/*chebyshev_panel: builds a Chebyshev surrogate of the n integrand on one panel
+ *                 [s_min, s_max] in s = log(n) and integrates it
+ *                 analytically.  The surrogate interpolates n times
+ *                 gamma_integration_result(n) at the N_SURROGATE_ORDER + 1
+ *                 Chebyshev extrema of the panel, so that integrating it
+ *                 over s gives the integral over n.  The error estimate is
+ *                 the difference to the surrogate built from every other
+ *                 node (half the order), which costs no extra gamma
+ *                 integrals.
+ *
+ *@params: s_min, s_max (panel bounds in log(n)), struct of parameters params,
+ *         values of the surrogate at the nodes s_k = mid + half cos(k pi/N),
+ *         where entries that are NAN are evaluated here and the others
+ *         (nodes shared with a neighbouring or parent panel) are reused,
+ *         pointer error to store the error estimate of the panel
+ *@returns: integral over n of the surrogate on the panel.
+ */
+static double chebyshev_panel(double s_min, double s_max,
+                              struct parameters * params,
+                              double values[N_SURROGATE_ORDER + 1],
+                              double * error
+                             )
+{
+  double mid  = (s_max + s_min)/2.;
+  double half = (s_max - s_min)/2.;
+
+#pragma omp parallel for schedule(dynamic) num_threads(number_of_threads(params)) \
+        if(params->n_threads > 0)
+  for (int k = 0; k <= N_SURROGATE_ORDER; k++)
+  {
+    if (isnan(values[k]))
+    {
+      double n  = exp(mid + half * cos(k * params->pi / N_SURROGATE_ORDER));
+      values[k] = n * planned_gamma_integration_result(n, params);
+    }
+  }
+
+  /*integral of the surrogate of order N_SURROGATE_ORDER and of the one of
+    half the order, which uses only the even nodes */
+  double integrals[2];
+
+  for (int pass = 0; pass < 2; pass++)
+  {
+    int stride = pass + 1;
+    int order  = N_SURROGATE_ORDER / stride;
+
+    integrals[pass] = 0.;
+
+    /*Chebyshev coefficients c_j of the interpolant sum'' c_j T_j(x); only
+      the even T_j have a nonzero integral over [-1, 1], 2/(1 - j^2) */
+    for (int j = 0; j <= order; j += 2)
+    {
+      double c_j = 0.;
+
+      for (int k = 0; k <= order; k++)
+      {
+        double weight = (k == 0 || k == order) ? 0.5 : 1.;
+        c_j += weight * values[k * stride] * cos(j * k * params->pi / order);
+      }
+      c_j *= 2./order;
+
+      if (j == 0 || j == order) c_j *= 0.5;
+
+      integrals[pass] += c_j * 2./(1. - j*j);
+    }
+
+    integrals[pass] *= half;
+  }
+
+  *error = fabs(integrals[0] - integrals[1]);
+
+  return integrals[0];
+}
+
+/*surrogate_panel: one panel [s_min, s_max] in s = log(n) of the
+ *                 Chebyshev surrogate, with the values at its nodes (see
+ *                 chebyshev_panel()), its integral and error estimate */
+struct surrogate_panel
+{
+  double s_min;
+  double s_max;
+  double values[N_SURROGATE_ORDER + 1];
+  double result;
+  double error;
+};
+
+/*unevaluated_nodes: marks all nodes of a panel as not yet evaluated for
+ *                   chebyshev_panel() */
+static void unevaluated_nodes(double values[N_SURROGATE_ORDER + 1])
+{
+  for (int k = 0; k <= N_SURROGATE_ORDER; k++) values[k] = NAN;
+}
+
+/*bisect_panel: splits panel at the middle into itself (the lower half) and
+ *              upper (the upper half) and integrates both.  The halves
+ *              reuse the values of the panel at both ends and in the
+ *              middle, so a bisection costs 2 N_SURROGATE_ORDER - 1 gamma
+ *              integrals.
+ *
+ *@params: panel to bisect, pointer upper to store the upper half, struct
+ *         of parameters params
+ */
+static void bisect_panel(struct surrogate_panel * panel,
+                         struct surrogate_panel * upper,
+                         struct parameters * params
+                        )
+{
+  double s_mid = (panel->s_min + panel->s_max)/2.;
+
+  /*node 0 is the upper end of a panel, node N_SURROGATE_ORDER the lower
+    end and node N_SURROGATE_ORDER/2 the middle */
+  upper->s_min = s_mid;
+  upper->s_max = panel->s_max;
+  unevaluated_nodes(upper->values);
+  upper->values[0]                 = panel->values[0];
+  upper->values[N_SURROGATE_ORDER] = panel->values[N_SURROGATE_ORDER/2];
+
+  double middle = panel->values[N_SURROGATE_ORDER/2];
+  double lower  = panel->values[N_SURROGATE_ORDER];
+
+  panel->s_max = s_mid;
+  unevaluated_nodes(panel->values);
+  panel->values[0]                 = middle;
+  panel->values[N_SURROGATE_ORDER] = lower;
+
+  panel->result = chebyshev_panel(panel->s_min, panel->s_max, params,
+                                  panel->values, &panel->error);
+  upper->result = chebyshev_panel(upper->s_min, upper->s_max, params,
+                                  upper->values, &upper->error);
+}
+
+/*n_surrogate_integral: alternative to the adaptive n integration in
+ *                      n_integration(), used when params->use_n_surrogate
+ *                      is set.  Every evaluation of the n integrand costs a
+ *                      full gamma integral, but the n integrand is smooth,
+ *                      so we sample it at a few adaptively chosen n and 
+ *                      integrate a piecewise Chebyshev surrogate of it
+ *                      instead.  The surrogate is built in s = log(n),
+ *                      starting from one panel per decade in n, which
+ *                      resolves both the peak near n_start at low nu/nu_c
+ *                      and the broad peak at n ~ 1e7 at high nu/nu_c.
+ *                      If n_stop is infinite, panels are added until they
+ *                      stop giving appreciable contributions and the
+ *                      remaining tail is summed as a geometric series of
+ *                      the last two panels; if nothing has accumulated
+ *                      once the distribution function vanishes over the
+ *                      whole resonance range in gamma, the integral is
+ *                      zero and the loop stops.  Then, as in QAG, the panel
+ *                      with the largest error estimate is bisected until
+ *                      the sum of the error estimates meets the relative
+ *                      tolerance.  Neighbouring panels share the values at
+ *                      their common ends.  The error estimate (panels plus
+ *                      tail) is added to params->n_integral_error.
+ *
+ *@params: n_start (lower bound of the n integral), n_stop (upper bound, or
+ *         INFINITY to find it adaptively), struct of parameters params
+ *@returns: result of the n integral from n_start to n_stop.
+ */
+double n_surrogate_integral(double n_start, double n_stop,
+                            struct parameters * params
+                           )
+{
+  double panel_width    = log(10.);
+  double tolerance      = 1.e5;
+  double relative_error = 1.e-3;
+  int    max_decades    = 40;
+  int    max_bisections = 60;
+
+  struct surrogate_panel panels[max_decades + max_bisections];
+  int    count = 0;
+
+  double ans        = 0.;
+  double tail       = 0.;
+  double tail_error = 0.;
+  double contrib    = 0.;
+  double previous_contrib = 0.;
+
+  double s_min  = log(n_start);
+  double s_stop = log(n_stop);
+
+  /*lowest Lorentz factor at which the distribution function is nonzero */
+  int    only_power_law = params->distribution == params->POWER_LAW
+                          || (   params->distribution == params->MIXTURE
+                              && params->mixture_weight[params->MAXWELL_JUETTNER]
+                                 == 0.
+                              && params->mixture_weight[params->KAPPA_DIST]
+                                 == 0.);
+  double gamma_floor    = only_power_law ? params->gamma_min : 1.;
+
+  /*one panel per decade, until the contributions become negligible */
+  while (count < max_decades && s_min < s_stop)
+  {
+    struct surrogate_panel * panel = &panels[count];
+
+    panel->s_min = s_min;
+    panel->s_max = fmin(s_min + panel_width, s_stop);
+    unevaluated_nodes(panel->values);
+
+    /*the lower end of this panel is the upper end of the previous one */
+    if (count > 0) panel->values[N_SURROGATE_ORDER] = panels[count-1].values[0];
+
+    panel->result = chebyshev_panel(panel->s_min, panel->s_max, params,
+                                    panel->values, &panel->error);
+    count++;
+
+    previous_contrib = contrib;
+    contrib = panel->result;
+    ans    += contrib;
+    s_min   = panel->s_max;
+
+    /*Nothing so far (the harmonics can still be too high for the
+      electrons), but the distribution function vanishes at the lower end
+      of the resonance range in gamma (eq. 10 of [1]) at the end of the
+      panel, above its bottom.  Above the bottom the distribution functions
+      only decrease, and for n nu_c/nu > 1 the lower end grows with n, so
+      every larger n contributes nothing either. */
+    double n_nu_c_over_nu = exp(panel->s_max) * params->nu_c / params->nu;
+
+    if (   isinf(s_stop) && ans == 0. && contrib == 0.
+        && n_nu_c_over_nu > 1.)
+    {
+      double sin_squared = params->sin_observer_angle
+                         * params->sin_observer_angle;
+      double root        = fabs(params->cos_observer_angle)
+                         * sqrt(  n_nu_c_over_nu*n_nu_c_over_nu
+                                - sin_squared);
+      double gamma_minus = (n_nu_c_over_nu - root) / sin_squared;
+
+      if (   gamma_minus > gamma_floor
+          && params->distribution_function(gamma_minus, params) == 0.)
+      {
+        break;
+      }
+    }
+
+    /*same stopping criterion as the adaptive routine in n_integration() */
+    if (isinf(s_stop) && ans != 0. && fabs(contrib) < fabs(ans/tolerance))
+    {
+      double ratio = contrib/previous_contrib;
+
+      if (previous_contrib != 0. && ratio > 0. && ratio < 1.)
+      {
+        tail       = contrib * ratio/(1. - ratio);
+        tail_error = fabs(tail);
+      }
+      else
+      {
+        tail_error = fabs(contrib);
+      }
+      break;
+    }
+  }
+
+  /*refine where the surrogate is least accurate; the sums run in panel
+    order, so that the result is reproducible */
+  double error = 0.;
+
+  for (int bisections = 0; ; bisections++)
+  {
+    int worst = 0;
+
+    ans   = 0.;
+    error = 0.;
+    for (int i = 0; i < count; i++)
+    {
+      ans   += panels[i].result;
+      error += panels[i].error;
+      if (panels[i].error > panels[worst].error) worst = i;
+    }
+
+    if (   error <= relative_error * fabs(ans + tail)
+        || bisections >= max_bisections)
+    {
+      break;
+    }
+
+    bisect_panel(&panels[worst], &panels[count], params);
+    count++;
+  }
+
+  params->n_integral_error += error + tail_error;
+
+  return ans + tail;
+}
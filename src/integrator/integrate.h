@@ -4,14 +4,34 @@
 #include <gsl/gsl_integration.h>
 #include <gsl/gsl_deriv.h>
 #include <gsl/gsl_errno.h>
+#include <float.h>
+#include <stdlib.h>
 #include "integrands.h"
+#include "continuum.h"
+
+/*order of the Chebyshev surrogate of the n integrand on each panel */
+#define N_SURROGATE_ORDER (8)
 
 double gamma_integral(double min, double max, double n,
                       struct parameters * params
                      );
+/*the stages of n_summation() below expect params with the evaluation plan
+  set (see set_evaluation_plan() in integrands.c) and, where the GSL error
+  handler is to be off (see quiet_integration() in integrate.c), the
+  handler turned off, as n_summation() does */
 double n_integral(double min, double max,
                   struct parameters * params
                  );
+double n_integral_threaded(double min, double max,
+                           struct parameters * params
+                          );
+double n_surrogate_integral(double n_start, double n_stop,
+                            struct parameters * params
+                           );
+double n_integration(double n_minus,
+                     double (*n_peak)(struct parameters * params),
+                     struct parameters * params
+                    );
 double derivative_of_n(double n_start, struct parameters * params);
 double n_summation(struct parameters *params);
 #endif /* SYMPHONY_INTEGRATE_H_ */
@@ -36,6 +36,28 @@ double maxwell_juettner_n_peak(struct parameters * params)
 }
 
 
+/*maxwell_juettner_bessel_K2: the modified Bessel function K_2(1/theta_e) in
+ *                            the normalization of the Maxwell-Juettner
+ *                            distribution.  This is the same at every
+ *                            quadrature node, so it is only recomputed
+ *                            when theta_e changes.
+ *
+ *@params: struct of parameters params
+ *@returns: K_2(1/theta_e)
+ */
+double maxwell_juettner_bessel_K2(struct parameters * params)
+{
+  static double bessel_K2        = 0.;
+  static double previous_theta_e = 0.;
+  if(bessel_K2 == 0. || previous_theta_e != params->theta_e)
+  {
+    bessel_K2        = gsl_sf_bessel_Kn(2, 1./params->theta_e);
+    previous_theta_e = params->theta_e;
+  }
+
+  return bessel_K2;
+}
+
 /*maxwell_juettner_f: Relativistic thermal (Maxwell-Juettner) distribution
  *                    function (eq. 14 and 15 of [1]).
  *
@@ -54,7 +76,7 @@ double maxwell_juettner_f(double gamma, struct parameters * params)
                  ) 
                  / (4. * params->pi 
                        * params->theta_e 
-                       * gsl_sf_bessel_Kn(2, 1./params->theta_e)
+                       * maxwell_juettner_bessel_K2(params)
                    );
 
   double ans = 1./(  pow(params->mass_electron, 3.)
@@ -87,7 +109,7 @@ double differential_of_maxwell_juettner(double gamma, struct parameters * params
                    * pow(params->speed_light, 3.));
 
   double term2 = params->electron_density
-                /(params->theta_e * gsl_sf_bessel_Kn(2, 1./params->theta_e));
+                /(params->theta_e * maxwell_juettner_bessel_K2(params));
 
   double body = (-1./(4. * params->pi * params->theta_e)) 
                 * exp(-gamma/params->theta_e);
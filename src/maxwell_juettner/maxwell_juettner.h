@@ -5,6 +5,7 @@
 #include <gsl/gsl_sf_bessel.h>
 
 double maxwell_juettner_f(double gamma, struct parameters * params);
+double maxwell_juettner_bessel_K2(struct parameters * params);
 double differential_of_maxwell_juettner(double gamma, struct parameters * params);
 double maxwell_juettner_n_peak(struct parameters * params);
 
@@ -0,0 +1,76 @@
+#include "mixture.h"
+
+/*mixture_f: weighted sum of the MAXWELL_JUETTNER, POWER_LAW, and KAPPA_DIST
+ *           distribution functions, e.g. a thermal core with a nonthermal
+ *           tail.  params->mixture_weight[key] is the fraction of
+ *           electron_density in the population with distribution key key;
+ *           each population uses the same distribution parameters as it
+ *           does on its own (theta_e, power_law_p, kappa, ...).  Summing
+ *           the populations here, inside the gamma integrand, means the
+ *           Bessel functions in polarization_term() are evaluated once for
+ *           all of them; populations with zero weight cost nothing.
+ *
+ *@params: Lorentz factor gamma, struct of parameters params
+ *@returns: the mixture distribution function evaluated at the input
+ *          Lorentz factor gamma.
+ */
+double mixture_f(double gamma, struct parameters * params)
+{
+  double ans = 0.;
+
+  if (params->mixture_weight[params->MAXWELL_JUETTNER] != 0.)
+  {
+    ans +=  params->mixture_weight[params->MAXWELL_JUETTNER]
+          * maxwell_juettner_f(gamma, params);
+  }
+
+  if (params->mixture_weight[params->POWER_LAW] != 0.)
+  {
+    ans +=  params->mixture_weight[params->POWER_LAW]
+          * power_law_f(gamma, params);
+  }
+
+  if (params->mixture_weight[params->KAPPA_DIST] != 0.)
+  {
+    ans +=  params->mixture_weight[params->KAPPA_DIST]
+          * kappa_f(gamma, params);
+  }
+
+  return ans;
+}
+
+/*differential_of_mixture: The integrand for the absorptivity calculation
+ *                         ([1] eq. 12) depends on a differential of the
+ *                         distribution function ([1] eq. 13).  For the
+ *                         mixture this is the weighted sum of the analytic
+ *                         differentials of its populations, left here as
+ *                         a test of the numerical differential like the
+ *                         ones it sums.
+ *
+ *@params: Lorentz factor gamma, struct of parameters params
+ *@returns: the differential of the mixture distribution function.
+ */
+double differential_of_mixture(double gamma, struct parameters * params)
+{
+  double Df = 0.;
+
+  if (params->mixture_weight[params->MAXWELL_JUETTNER] != 0.)
+  {
+    Df +=  params->mixture_weight[params->MAXWELL_JUETTNER]
+         * differential_of_maxwell_juettner(gamma, params);
+  }
+
+  if (params->mixture_weight[params->POWER_LAW] != 0.)
+  {
+    Df +=  params->mixture_weight[params->POWER_LAW]
+         * differential_of_power_law(gamma, params);
+  }
+
+  if (params->mixture_weight[params->KAPPA_DIST] != 0.)
+  {
+    Df +=  params->mixture_weight[params->KAPPA_DIST]
+         * differential_of_kappa(gamma, params);
+  }
+
+  return Df;
+}
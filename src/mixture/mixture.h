@@ -0,0 +1,11 @@
+#ifndef SYMPHONY_MIXTURE_H_
+#define SYMPHONY_MIXTURE_H_
+#include "../params.h"
+#include "../maxwell_juettner/maxwell_juettner.h"
+#include "../power_law/power_law.h"
+#include "../kappa/kappa.h"
+
+double mixture_f(double gamma, struct parameters * params);
+double differential_of_mixture(double gamma, struct parameters * params);
+
+#endif /* SYMPHONY_MIXTURE_H_ */
@@ -23,6 +23,7 @@ void setConstParams(struct parameters *params)
   params->MAXWELL_JUETTNER = 0;
   params->POWER_LAW        = 1;
   params->KAPPA_DIST       = 2;
+  params->MIXTURE          = 3;
   /* Keys for the polarization parameter */
   params->STOKES_I         = 15;
   params->STOKES_Q         = 16;
@@ -31,8 +32,20 @@ void setConstParams(struct parameters *params)
   /* Keys for the mode: absorptivity or emissivity */
   params->ABSORPTIVITY     = 10;
   params->EMISSIVITY       = 11;
+  /* Default: no populations in the MIXTURE distribution */
+  params->mixture_weight[params->MAXWELL_JUETTNER] = 0.;
+  params->mixture_weight[params->POWER_LAW]        = 0.;
+  params->mixture_weight[params->KAPPA_DIST]       = 0.;
   /*Default: find n-space peak adaptively */
   params->use_n_peak       = 0;
+  /*Default: adaptive QAG steps for the n integral */
+  params->use_n_surrogate  = 0;
+  params->n_integral_error = 0.;
+  /*Default: always sum the harmonics exactly */
+  params->use_continuum       = 0;
+  params->continuum_tolerance = 1.e-3;
+  /*Default: evaluate on the calling thread only */
+  params->n_threads        = 0;
   params->error_message    = NULL;
 }
 
@@ -18,6 +18,7 @@ struct parameters
   int    MAXWELL_JUETTNER;
   int    POWER_LAW;
   int    KAPPA_DIST;
+  int    MIXTURE;
   /*Keys for the polarization modes*/
   int    STOKES_I;
   int    STOKES_Q;
@@ -49,10 +50,33 @@ struct parameters
   double kappa;
   double kappa_width;
 
+  /*mixture distribution parameters: fraction of electron_density in the
+    MAXWELL_JUETTNER, POWER_LAW, and KAPPA_DIST populations, indexed by
+    their keys */
+  double mixture_weight[3];
+
   /*Choose if n-space peak is known, or if it must be found adaptively */
   int use_n_peak;
   double (*n_peak)(struct parameters *);
 
+  /*Choose if the n integral past n_max is done with adaptive QAG steps, or
+    by integrating a Chebyshev surrogate of the n integrand (see
+    n_surrogate_integral() in integrate.c) */
+  int use_n_surrogate;
+  double n_integral_error; /* error estimate of the surrogate n integral */
+
+  /*Choose if the continuum (synchrotron function) limit is used when its
+    estimated relative error is below continuum_tolerance (see
+    continuum_result() in continuum.c); Stokes V is always exact */
+  int use_continuum;
+  double continuum_tolerance;
+
+  /*Number of threads over which a single call spreads the harmonics of the
+    n sum and the nodes of the n integral (needs OpenMP; see
+    n_integral_threaded() in integrate.c).  0 is the serial QAG path; for
+    n_threads >= 1 the result does not depend on the number of threads */
+  int n_threads;
+
   /*Set distribution_function */
   double (*distribution_function)(double gamma, struct parameters *);
 
@@ -62,6 +86,17 @@ struct parameters
 
   int stokes_v_switch;
 
+  /*Evaluation plan: invariants of a single j_nu() or alpha_nu() call and the
+    integrand specialized to its mode and Stokes parameter; these are set
+    by set_evaluation_plan() in integrands.c at the start of n_summation()
+    so that the gamma integrand only does gamma-dependent work */
+  double nu_c;
+  double cos_observer_angle;
+  double sin_observer_angle;
+  double gamma_integrand_prefactor;
+  double (*polarization_kernel)(double M, double N, double J, double dJ);
+  double (*gamma_integrand_function)(double gamma, void * paramsGSLInput);
+
   char *error_message; /* if not NULL, records source of error in current calculation */
 };
 
@@ -59,12 +59,21 @@ double power_law_f(double gamma, struct parameters * params)
   static double previous_gamma_min    = 0.;
   static double previous_gamma_max    = 0.;
   static double previous_gamma_cutoff = 0.;
+  /*likewise, the shape prefactor (without electron_density) and 
+    1/(m^3 c^3) only change with the distribution function parameters */
+  static double shape_prefactor = 0.;
+  static double d3p_to_dgamma   = 0.;
   if(norm == 0. || previous_power_law_p  != params->power_law_p
                 || previous_gamma_min    != params->gamma_min
                 || previous_gamma_max    != params->gamma_max
                 || previous_gamma_cutoff != params->gamma_cutoff)
   {
     norm = 1./normalize_f(&power_law_to_be_normalized, params);
+    shape_prefactor = (params->power_law_p - 1.) 
+                     / (pow(params->gamma_min, 1. - params->power_law_p) 
+                        - pow(params->gamma_max, 1. - params->power_law_p));
+    d3p_to_dgamma   = 1./(  pow(params->mass_electron, 3.) 
+                          * pow(params->speed_light, 3.));
     previous_power_law_p  = params->power_law_p;
     previous_gamma_min    = params->gamma_min;
     previous_gamma_max    = params->gamma_max;
@@ -76,17 +85,13 @@ double power_law_f(double gamma, struct parameters * params)
 
   double beta = sqrt(1. - 1./(gamma*gamma));
 
-  double prefactor = params->electron_density * (params->power_law_p - 1.) 
-                     / (pow(params->gamma_min, 1. - params->power_law_p) 
-                        - pow(params->gamma_max, 1. - params->power_law_p));
+  double prefactor = params->electron_density * shape_prefactor;
 
   double body = pow(gamma, -params->power_law_p) 
                 * exp(- gamma / params->gamma_cutoff);
 
   double ans = norm * prefactor * body 
-               * 1./(pow(params->mass_electron, 3.) 
-               * pow(params->speed_light, 3.) 
-               * gamma*gamma * beta);
+               * d3p_to_dgamma / (gamma*gamma * beta);
 
   return ans;
 
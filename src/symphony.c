@@ -1,4 +1,5 @@
 #include "symphony.h"
+#include <stdlib.h>
 
 /* GSL error handling. This isn't thread-safe since we have to use a single
  * global variable to track the current best error message destination.
@@ -18,19 +19,70 @@ _handle_gsl_error (const char *reason, const char *file, int line, int gsl_errno
 {
     const size_t buf_size = 4096; /* arbitrary */
 
+    /* With params.n_threads > 0 several threads of one call can get here at
+     * once; they share the single error message destination. */
+#pragma omp critical (symphony_gsl_error)
+    {
     if (global_gsl_error_message == NULL) {
        fprintf (stderr, "unhandled GSL error: %s (%d; %s:%d)\n", reason,
                 gsl_errno, file, line);
-       return;
+    } else {
+       free (*global_gsl_error_message);
+       *global_gsl_error_message = (char *) calloc (buf_size, 1);
+       snprintf (*global_gsl_error_message, buf_size - 1,
+	         "GSL error: %s (%d; %s:%d)", reason, gsl_errno, file, line);
+       _symphony_error_trap (*global_gsl_error_message);
+    }
     }
-
-    *global_gsl_error_message = (char *) calloc (buf_size, 1);
-    snprintf (*global_gsl_error_message, buf_size - 1,
-	      "GSL error: %s (%d; %s:%d)", reason, gsl_errno, file, line);
-    _symphony_error_trap (*global_gsl_error_message);
 }
 
 
+/*symphony_integrate: performs the emissivity or absorptivity calculation
+ *                    (depending on params->mode) for a struct of
+ *                    parameters that has already been populated by the
+ *                    caller, e.g. by j_nu() or alpha_nu() below.  This is
+ *                    also the entry point for callers that want to set
+ *                    optional fields of the struct, such as
+ *                    use_n_surrogate, that j_nu() and alpha_nu() leave
+ *                    at the defaults of setConstParams().
+ *
+ *@params: struct of parameters params, populated with the user params
+ *@returns: n_summation(params), the emissivity or absorptivity.  If an
+ *          error occurred and error_message is not NULL, *error_message
+ *          will be set to a malloc()ed string explaining the error and
+ *          NAN is returned.
+ */
+double symphony_integrate(struct parameters *params, char **error_message)
+{
+  gsl_error_handler_t *prev_handler;
+  double retval;
+
+  if (error_message != NULL)
+    *error_message = NULL; /* Initialize the user's error message. */
+
+  params->error_message = NULL;
+
+  global_gsl_error_message = &params->error_message;
+  prev_handler = gsl_set_error_handler (_handle_gsl_error);
+  set_distribution_function(params);
+  retval = n_summation(params);
+  gsl_set_error_handler (prev_handler);
+  global_gsl_error_message = NULL;
+
+  /* Success? */
+
+  if (params->error_message == NULL)
+    return retval;
+
+  /* Something went wrong. Give the caller the error message if they
+   * provided us with a place to save it. */
+
+  if (error_message != NULL)
+    *error_message = params->error_message;
+
+  return NAN;
+}
+
 /*j_nu: wrapper for the emissivity calculation; takes in values of all
  *      necessary paramters and sets a struct of parameters using the input
  *      values.  It then passes this struct to n_summation(), which begins
@@ -40,7 +92,7 @@ _handle_gsl_error (const char *reason, const char *file, int line, int gsl_errno
  *         distribution, polarization, theta_e, power_law_p,
  *         gamma_min, gamma_max, gamma_cutoff, kappa,
  *         kappa_width
- *@returns: n_summation(&params), which takes the struct of
+ *@returns: symphony_integrate(&params), which takes the struct of
  *          parameters (now populated with values) and
  *          performs the integration to evaluate j_nu(). If an
  *          error occurred and error_message is not NULL,
@@ -63,9 +115,6 @@ double j_nu(double nu,
             char **error_message
            )
 {
-  gsl_error_handler_t *prev_handler;
-  double retval;
-
 /*fill the struct with values*/
   struct parameters params;
   setConstParams(&params);
@@ -84,28 +133,7 @@ double j_nu(double nu,
   params.kappa              = kappa;
   params.kappa_width        = kappa_width;
 
-  if (error_message != NULL)
-    *error_message = NULL; /* Initialize the user's error message. */
-
-  global_gsl_error_message = &params.error_message;
-  prev_handler = gsl_set_error_handler (_handle_gsl_error);
-  set_distribution_function(&params);
-  retval = n_summation(&params);
-  gsl_set_error_handler (prev_handler);
-  global_gsl_error_message = NULL;
-
-  /* Success? */
-
-  if (params.error_message == NULL)
-    return retval;
-
-  /* Something went wrong. Give the caller the error message if they
-   * provided us with a place to save it. */
-
-  if (error_message != NULL)
-    *error_message = params.error_message;
-
-  return NAN;
+  return symphony_integrate(&params, error_message);
 }
 
 /*alpha_nu: wrapper for the absorptivity calculation; takes in values of all
@@ -117,7 +145,7 @@ double j_nu(double nu,
  *         distribution, polarization, theta_e, power_law_p,
  *         gamma_min, gamma_max, gamma_cutoff, kappa,
  *         kappa_width
- *@returns: n_summation(&params), which takes the struct of
+ *@returns: symphony_integrate(&params), which takes the struct of
  *          parameters (now populated with values) and
  *          performs the integration to evaluate alpha_nu().
  */
@@ -138,9 +166,6 @@ double alpha_nu(double nu,
 		char **error_message
                )
 {
-  gsl_error_handler_t *prev_handler;
-  double retval;
-
 /*fill the struct with values*/
   struct parameters params;
   setConstParams(&params);
@@ -159,26 +184,5 @@ double alpha_nu(double nu,
   params.kappa              = kappa;
   params.kappa_width        = kappa_width;
 
-  if (error_message != NULL)
-    *error_message = NULL; /* Initialize the user's error message. */
-
-  global_gsl_error_message = &params.error_message;
-  prev_handler = gsl_set_error_handler (_handle_gsl_error);
-  set_distribution_function(&params);
-  retval = n_summation(&params);
-  gsl_set_error_handler (prev_handler);
-  global_gsl_error_message = NULL;
-
-  /* Success? */
-
-  if (params.error_message == NULL)
-    return retval;
-
-  /* Something went wrong. Give the caller the error message if they
-   * provided us with a place to save it. */
-
-  if (error_message != NULL)
-    *error_message = params.error_message;
-
-  return NAN;
+  return symphony_integrate(&params, error_message);
 }
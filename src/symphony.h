@@ -5,6 +5,9 @@
 #include "params.h"
 #include "fits.h"
 #include "integrator/integrate.h"
+#include "batch.h"
+
+double symphony_integrate(struct parameters *params, char **error_message);
 
 double j_nu(double nu,
             double magnetic_field,
@@ -1,3 +1,44 @@
+from libc.stddef cimport ptrdiff_t
+
+cdef extern from "params.h":
+
+    struct parameters:
+        int    MAXWELL_JUETTNER
+        int    POWER_LAW
+        int    KAPPA_DIST
+        int    MIXTURE
+        int    STOKES_I
+        int    STOKES_Q
+        int    STOKES_U
+        int    STOKES_V
+        int    ABSORPTIVITY
+        int    EMISSIVITY
+
+        double nu
+        double magnetic_field
+        double electron_density
+        double observer_angle
+        int    distribution
+        int    polarization
+        int    mode
+        double gamma_cutoff
+        double theta_e
+        double power_law_p
+        double gamma_min
+        double gamma_max
+        double kappa
+        double kappa_width
+        double mixture_weight[3]
+
+        int    use_n_surrogate
+        double n_integral_error
+        int    use_continuum
+        double continuum_tolerance
+
+        int    n_threads
+
+    void setConstParams(parameters *params)
+
 cdef extern from "symphony.h":
     
     double j_nu(double nu,
@@ -15,6 +56,8 @@ cdef extern from "symphony.h":
                 double kappa_width,
                 char **error_message)
 
+    double symphony_integrate(parameters *params, char **error_message)
+
     double alpha_nu(double nu,
                     double magnetic_field,
                     double electron_density,
@@ -72,3 +115,49 @@ cdef extern from "symphony.h":
                         double kappa,
                         double kappa_width)
 
+
+cdef extern from "batch.h":
+
+    struct strided_double:
+        const double *data
+        ptrdiff_t stride
+
+    struct strided_int:
+        const int *data
+        ptrdiff_t stride
+
+    struct batch_inputs:
+        strided_double nu
+        strided_double magnetic_field
+        strided_double electron_density
+        strided_double observer_angle
+        strided_int    distribution
+        strided_int    polarization
+        strided_double theta_e
+        strided_double power_law_p
+        strided_double gamma_min
+        strided_double gamma_max
+        strided_double gamma_cutoff
+        strided_double kappa
+        strided_double kappa_width
+
+    ctypedef int (*batch_progress_function)(size_t done, size_t count,
+                                            void *data)
+
+    size_t symphony_integrate_batch(const parameters *template_params,
+                                    size_t count,
+                                    const batch_inputs *inputs,
+                                    double *out,
+                                    ptrdiff_t out_stride,
+                                    char **error_message)
+
+    size_t symphony_integrate_batch_progress(
+                                    const parameters *template_params,
+                                    size_t count,
+                                    const batch_inputs *inputs,
+                                    double *out,
+                                    ptrdiff_t out_stride,
+                                    batch_progress_function progress,
+                                    void *progress_data,
+                                    size_t *done,
+                                    char **error_message)
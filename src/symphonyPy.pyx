@@ -1,4 +1,79 @@
-from symphonyHeaders cimport j_nu, alpha_nu, j_nu_fit, alpha_nu_fit, rho_nu_fit
+from symphonyHeaders cimport parameters, setConstParams, symphony_integrate
+from symphonyHeaders cimport j_nu_fit, alpha_nu_fit, rho_nu_fit
+from symphonyHeaders cimport (strided_double, strided_int, batch_inputs,
+                              symphony_integrate_batch,
+                              symphony_integrate_batch_progress)
+from libc.stdlib cimport free
+from cpython.exc cimport PyErr_CheckSignals
+import multiprocessing
+import warnings
+import numpy as np
+
+cdef void _set_params(parameters *params,
+                      double nu,
+                      double magnetic_field,
+                      double electron_density,
+                      double observer_angle,
+                      int distribution,
+                      int polarization,
+                      double theta_e,
+                      double power_law_p,
+                      double gamma_min,
+                      double gamma_max,
+                      double gamma_cutoff,
+                      double kappa,
+                      double kappa_width):
+
+  """Fills the struct of parameters the same way j_nu() and alpha_nu() do;
+     the mode (emissivity or absorptivity) is left to the caller."""
+
+  setConstParams(params)
+  params.nu               = nu
+  params.magnetic_field   = magnetic_field
+  params.electron_density = electron_density
+  params.observer_angle   = observer_angle
+  params.distribution     = distribution
+  params.polarization     = polarization
+  params.theta_e          = theta_e
+  params.power_law_p      = power_law_p
+  params.gamma_min        = gamma_min
+  params.gamma_max        = gamma_max
+  params.gamma_cutoff     = gamma_cutoff
+  params.kappa            = kappa
+  params.kappa_width      = kappa_width
+
+cdef _set_options(parameters *params,
+                  bint n_surrogate,
+                  bint continuum,
+                  mixture_weights,
+                  int threads=0):
+
+  """Sets the optional fields of the struct of parameters from the keyword
+     arguments shared by the evaluation functions below."""
+
+  params.use_n_surrogate = n_surrogate
+  params.use_continuum   = continuum
+  params.n_threads       = threads
+
+  if mixture_weights is not None:
+    weights = [float(weight) for weight in mixture_weights]
+    if len(weights) != 3:
+      raise ValueError ('mixture_weights needs one weight for each of '
+                        'MAXWELL_JUETTNER, POWER_LAW, and KAPPA_DIST')
+    params.mixture_weight[params.MAXWELL_JUETTNER] = weights[0]
+    params.mixture_weight[params.POWER_LAW]        = weights[1]
+    params.mixture_weight[params.KAPPA_DIST]       = weights[2]
+
+cdef double _integrate(parameters *params) except? -1:
+
+  """Runs symphony_integrate() and turns its error message into a
+     RuntimeError."""
+
+  cdef char* error_message = NULL
+  result = symphony_integrate(params, &error_message)
+  if error_message:
+    raise RuntimeError (error_message)
+  return result
 
 def j_nu_py(double nu,
             double magnetic_field,
@@ -12,26 +87,55 @@ def j_nu_py(double nu,
             double gamma_max,
             double gamma_cutoff,
             double kappa,
-            double kappa_width):
+            double kappa_width,
+            bint n_surrogate=False,
+            bint continuum=False,
+            mixture_weights=None,
+            int threads=0,
+            bint return_error=False):
 
   """Returns j_nu(nu, magnetic_field, electron_density, observer_angle, 
                   distribution, polarization, theta_e, power_law_p, 
                   gamma_min, gamma_max, gamma_cutoff, kappa, kappa_width).
      Keys for distribution functions: symphonyPy.MAXWELL_JUETTNER, 
                                       symphonyPy.POWER_LAW, 
-                                      symphonyPy.KAPPA_DIST
+                                      symphonyPy.KAPPA_DIST,
+                                      symphonyPy.MIXTURE
      Keys for Stokes parameter: symphonyPy.STOKES_I,
                                 symphonyPy.STOKES_Q,
                                 symphonyPy.STOKES_U,
-                                symphonyPy.STOKES_V"""
+                                symphonyPy.STOKES_V
+     If n_surrogate is True, the n integral past n_max is done by
+     integrating a Chebyshev surrogate of the n integrand, which needs
+     far fewer gamma integrals than the default adaptive steps.
+     If continuum is True, Stokes I and Q are computed in the continuum
+     (synchrotron function) limit whenever its estimated relative error is
+     below 1e-3, which is much faster at high nu/nu_c.
+     For distribution symphonyPy.MIXTURE, mixture_weights is the fraction
+     of electron_density in the (MAXWELL_JUETTNER, POWER_LAW, KAPPA_DIST)
+     populations, which are all integrated in a single pass.
+     If threads is 1 or more, the harmonics of the n sum and the nodes of
+     the n integral are spread over that many threads (if symphony was
+     built with OpenMP).  The result is then the same for any number of
+     threads; it can differ from that of threads=0 (the default serial
+     path) within the 1e-3 integration tolerance.
+     If return_error is True (this needs n_surrogate=True), returns a
+     tuple (value, error), where error is the error estimate of the
+     surrogate n integral."""
 
-  cdef char* error_message = NULL
-  result = j_nu(nu, magnetic_field, electron_density,
-                observer_angle, distribution, polarization,
-                theta_e, power_law_p, gamma_min, gamma_max,
-                gamma_cutoff, kappa, kappa_width, &error_message)
-  if error_message:
-    raise RuntimeError (error_message)
+  if return_error and not n_surrogate:
+    raise ValueError ('return_error needs n_surrogate=True')
+
+  cdef parameters params
+  _set_params(&params, nu, magnetic_field, electron_density,
+              observer_angle, distribution, polarization,
+              theta_e, power_law_p, gamma_min, gamma_max,
+              gamma_cutoff, kappa, kappa_width)
+  params.mode            = params.EMISSIVITY
+  _set_options(&params, n_surrogate, continuum, mixture_weights, threads)
+  result = _integrate(&params)
+  if return_error:
+    return result, params.n_integral_error
   return result
 
 def alpha_nu_py(double nu,
@@ -46,26 +150,55 @@ def alpha_nu_py(double nu,
                 double gamma_max,
                 double gamma_cutoff,
                 double kappa,
-                double kappa_width):
+                double kappa_width,
+                bint n_surrogate=False,
+                bint continuum=False,
+                mixture_weights=None,
+                int threads=0,
+                bint return_error=False):
 
   """Returns alpha_nu(nu, magnetic_field, electron_density, observer_angle,
                       distribution, polarization, theta_e, power_law_p, 
                       gamma_min, gamma_max, gamma_cutoff, kappa, kappa_width).
      Keys for distribution functions: symphonyPy.MAXWELL_JUETTNER, 
                                       symphonyPy.POWER_LAW, 
-                                      symphonyPy.KAPPA_DIST
+                                      symphonyPy.KAPPA_DIST,
+                                      symphonyPy.MIXTURE
      Keys for Stokes parameter: symphonyPy.STOKES_I,
                                 symphonyPy.STOKES_Q,
                                 symphonyPy.STOKES_U,
-                                symphonyPy.STOKES_V"""
+                                symphonyPy.STOKES_V
+     If n_surrogate is True, the n integral past n_max is done by
+     integrating a Chebyshev surrogate of the n integrand, which needs
+     far fewer gamma integrals than the default adaptive steps.
+     If continuum is True, Stokes I and Q are computed in the continuum
+     (synchrotron function) limit whenever its estimated relative error is
+     below 1e-3, which is much faster at high nu/nu_c.
+     For distribution symphonyPy.MIXTURE, mixture_weights is the fraction
+     of electron_density in the (MAXWELL_JUETTNER, POWER_LAW, KAPPA_DIST)
+     populations, which are all integrated in a single pass.
+     If threads is 1 or more, the harmonics of the n sum and the nodes of
+     the n integral are spread over that many threads (if symphony was
+     built with OpenMP).  The result is then the same for any number of
+     threads; it can differ from that of threads=0 (the default serial
+     path) within the 1e-3 integration tolerance.
+     If return_error is True (this needs n_surrogate=True), returns a
+     tuple (value, error), where error is the error estimate of the
+     surrogate n integral."""
 
-  cdef char* error_message = NULL
-  result = alpha_nu(nu, magnetic_field, electron_density,
-                    observer_angle, distribution, polarization,
-                    theta_e, power_law_p, gamma_min, gamma_max,
-                    gamma_cutoff, kappa, kappa_width, &error_message)
-  if error_message:
-    raise RuntimeError (error_message)
+  if return_error and not n_surrogate:
+    raise ValueError ('return_error needs n_surrogate=True')
+
+  cdef parameters params
+  _set_params(&params, nu, magnetic_field, electron_density,
+              observer_angle, distribution, polarization,
+              theta_e, power_law_p, gamma_min, gamma_max,
+              gamma_cutoff, kappa, kappa_width)
+  params.mode            = params.ABSORPTIVITY
+  _set_options(&params, n_surrogate, continuum, mixture_weights, threads)
+  result = _integrate(&params)
+  if return_error:
+    return result, params.n_integral_error
   return result
 
 def j_nu_fit_py(double nu,
@@ -161,10 +294,1061 @@ def rho_nu_fit_py(double nu,
 
 
 
+def _angle_masses(angle_distribution, int polarization):
+
+  """Converts a distribution of observer angles into angles in [0, pi/2]
+     and the probability mass at each of them, folding angle -> pi - angle
+     (the coefficients are symmetric under it for Stokes I and Q and
+     antisymmetric for Stokes V, whose masses change sign).
+     angle_distribution is either an array of angle samples, a
+     (counts, bin_edges) tuple as returned by numpy.histogram, or a
+     callable pdf(angle) on [0, pi]."""
+
+  sign = -1. if polarization == STOKES_V else 1.
+
+  if callable(angle_distribution):
+    #locate the probability mass of the folded pdf on a fine grid, then
+    #resolve it with Gauss-Legendre points where it is
+    n_grid = 4096
+    step   = np.pi/2./n_grid
+    grid   = (np.arange(n_grid) + 0.5) * step
+    lower_half = np.asarray(angle_distribution(grid), dtype=float)
+    upper_half = np.asarray(angle_distribution(np.pi - grid), dtype=float)
+    if not (np.all(np.isfinite(lower_half)) and np.all(lower_half >= 0.)
+            and np.all(np.isfinite(upper_half)) and np.all(upper_half >= 0.)):
+      raise ValueError ('angle pdf must be finite and nonnegative on [0, pi]')
+    total = (lower_half + upper_half).sum() * step
+    if total <= 0.:
+      raise ValueError ('angle distribution has no probability mass')
+    cells = (lower_half + sign * upper_half) * step
+    lower, upper = _mass_quantiles(grid, cells)
+    lower  = max(lower - step/2., 0.)
+    upper  = min(upper + step/2., np.pi/2.)
+    x, w   = np.polynomial.legendre.leggauss(200)
+    inside = lower + (upper - lower) * (x + 1.)/2.
+    masses = w * (upper - lower)/2. * (
+               np.asarray(angle_distribution(inside), dtype=float)
+             + sign * np.asarray(angle_distribution(np.pi - inside),
+                                 dtype=float))
+    outside = (grid < lower) | (grid > upper)
+    return (np.concatenate([inside, grid[outside]]),
+            np.concatenate([masses, cells[outside]])/total)
+
+  if isinstance(angle_distribution, tuple):
+    counts, edges = angle_distribution
+    counts = np.asarray(counts, dtype=float).ravel()
+    edges  = np.asarray(edges, dtype=float).ravel()
+    if (len(edges) != len(counts) + 1 or np.any(np.diff(edges) < 0.)
+        or not np.all(np.isfinite(counts)) or np.any(counts < 0.)):
+      raise ValueError ('angle histogram needs nonnegative counts and '
+                        'len(counts) + 1 increasing bin edges')
+    #spread the counts of each bin over it with a few Gauss-Legendre points
+    x, w   = np.polynomial.legendre.leggauss(4)
+    center = (edges[1:] + edges[:-1])/2.
+    width  = (edges[1:] - edges[:-1])/2.
+    angles = (center[:, None] + width[:, None] * x[None, :]).ravel()
+    masses = (counts[:, None] * w[None, :]/2.).ravel()
+    bounds = edges
+  else:
+    angles = np.asarray(angle_distribution, dtype=float).ravel()
+    masses = np.ones_like(angles)
+    bounds = angles
+
+  if not (np.all(np.isfinite(bounds)) and np.all(bounds >= 0.)
+          and np.all(bounds <= np.pi)):
+    raise ValueError ('observer angles must lie in [0, pi]')
+  if masses.sum() <= 0.:
+    raise ValueError ('angle distribution has no probability mass')
+
+  total   = masses.sum()
+  flipped = angles > np.pi/2.
+  angles  = np.where(flipped, np.pi - angles, angles)
+  masses  = np.where(flipped, sign * masses, masses)
+
+  return angles, masses/total
+
+def _mass_quantiles(angles, masses, double tail=1e-4):
+
+  """Returns the angles below and above which a fraction tail of the
+     (absolute) probability mass lies."""
+
+  order   = np.argsort(angles)
+  angles  = angles[order]
+  summed  = np.cumsum(np.abs(masses[order]))
+  summed /= summed[-1]
+  last    = len(angles) - 1
+  return (angles[min(np.searchsorted(summed, tail), last)],
+          angles[min(np.searchsorted(summed, 1. - tail), last)])
+
+def _chebyshev_weights(angles, masses, nodes):
+
+  """Quadrature weights for the values at the Chebyshev extrema nodes: the
+     expectation of each Lagrange basis polynomial (in barycentric form)
+     under the masses at angles."""
+
+  bary      = (-1.)**np.arange(len(nodes))
+  bary[0]  *= 0.5
+  bary[-1] *= 0.5
+
+  #angles that coincide with a node get the Kronecker delta
+  diff    = angles[:, None] - nodes[None, :]
+  exact   = diff == 0.
+  diff[exact] = 1.
+  basis   = bary[None, :]/diff
+  basis  /= basis.sum(axis=1)[:, None]
+  on_node = exact.any(axis=1)
+  basis[on_node] = exact[on_node]
+
+  return masses.dot(basis)
+
+def _angle_average(int mode,
+                   angle_distribution,
+                   double nu,
+                   double magnetic_field,
+                   double electron_density,
+                   int distribution,
+                   int polarization,
+                   double theta_e,
+                   double power_law_p,
+                   double gamma_min,
+                   double gamma_max,
+                   double gamma_cutoff,
+                   double kappa,
+                   double kappa_width,
+                   int n_nodes,
+                   bint n_surrogate,
+                   bint continuum,
+                   mixture_weights,
+                   bint return_error):
+
+  """Averages j_nu or alpha_nu (depending on mode) over a distribution of
+     observer angles by interpolatory quadrature on n_nodes Chebyshev
+     extrema.  The distribution is folded onto [0, pi/2] first, so both
+     halves share the same nodes, and the nodes span the range between
+     the 1e-4 and 1 - 1e-4 quantiles of its mass; the mass in the tails is
+     moved to the ends of that range.  The quadrature weight of each node
+     is the expectation of its Lagrange basis polynomial under the folded
+     distribution.  The error estimate is the difference to the rule on
+     every other node, which needs no extra evaluations."""
+
+  cdef parameters params
+
+  if n_nodes < 3 or n_nodes % 2 == 0:
+    raise ValueError ('n_nodes must be odd and at least 3')
+
+  angles, masses = _angle_masses(angle_distribution, polarization)
+
+  if polarization == STOKES_U or not np.any(masses != 0.):
+    if return_error:
+      return 0., 0.
+    return 0.
+
+  lower, upper = _mass_quantiles(angles, masses)
+  angles = np.clip(angles, lower, upper)
+
+  if upper - lower <= 1e-12 * np.pi:
+    nodes   = np.array([(lower + upper)/2.])
+    weights = np.array([masses.sum()])
+    coarse  = weights
+  else:
+    nodes   = (lower + upper)/2. + (upper - lower)/2. * np.cos(
+                np.arange(n_nodes) * np.pi/(n_nodes - 1))
+    weights = _chebyshev_weights(angles, masses, nodes)
+    coarse  = _chebyshev_weights(angles, masses, nodes[::2])
+
+  values = np.empty(len(nodes))
+  for i, node in enumerate(nodes):
+    _set_params(&params, nu, magnetic_field, electron_density,
+                node, distribution, polarization,
+                theta_e, power_law_p, gamma_min, gamma_max,
+                gamma_cutoff, kappa, kappa_width)
+    params.mode            = mode
+    _set_options(&params, n_surrogate, continuum, mixture_weights)
+    values[i] = _integrate(&params)
+
+  result = weights.dot(values)
+  error  = abs(result - coarse.dot(values[::2]))
+
+  if return_error:
+    return result, error
+  if error > 1e-2 * np.abs(weights * values).sum():
+    warnings.warn('the angle average is not resolved by %d nodes (estimated '
+                  'error %.2g of %.2g); the coefficient varies too steeply '
+                  'across the angle distribution' % (n_nodes, error, result),
+                  RuntimeWarning)
+  return result
+
+def j_nu_angle_averaged_py(angle_distribution,
+                           double nu,
+                           double magnetic_field,
+                           double electron_density,
+                           int distribution,
+                           int polarization,
+                           double theta_e,
+                           double power_law_p,
+                           double gamma_min,
+                           double gamma_max,
+                           double gamma_cutoff,
+                           double kappa,
+                           double kappa_width,
+                           int n_nodes=9,
+                           bint n_surrogate=False,
+                           bint continuum=False,
+                           mixture_weights=None,
+                           bint return_error=False):
+
+  """Returns j_nu averaged over a distribution of observer angles (rad),
+     using n_nodes evaluations of j_nu instead of one per angle.
+     angle_distribution is either an array of angle samples (e.g. the
+     observer angle of every cell), a (counts, bin_edges) tuple as
+     returned by numpy.histogram, or a callable pdf(angle) on [0, pi]
+     (e.g. scipy.stats.norm(mean, sigma).pdf); angles must lie in
+     [0, pi].  n_nodes must be odd.  A RuntimeWarning is issued when the
+     estimated error exceeds 1% of the average; with return_error=True,
+     (average, error estimate) is returned instead.  The other arguments
+     are the same as for j_nu_py(), without observer_angle."""
+
+  cdef parameters params
+  setConstParams(&params)
+  return _angle_average(params.EMISSIVITY, angle_distribution, nu,
+                        magnetic_field, electron_density, distribution,
+                        polarization, theta_e, power_law_p, gamma_min,
+                        gamma_max, gamma_cutoff, kappa, kappa_width,
+                        n_nodes, n_surrogate, continuum,
+                        mixture_weights, return_error)
+
+def alpha_nu_angle_averaged_py(angle_distribution,
+                               double nu,
+                               double magnetic_field,
+                               double electron_density,
+                               int distribution,
+                               int polarization,
+                               double theta_e,
+                               double power_law_p,
+                               double gamma_min,
+                               double gamma_max,
+                               double gamma_cutoff,
+                               double kappa,
+                               double kappa_width,
+                               int n_nodes=9,
+                               bint n_surrogate=False,
+                               bint continuum=False,
+                               mixture_weights=None,
+                               bint return_error=False):
+
+  """Returns alpha_nu averaged over a distribution of observer angles (rad),
+     using n_nodes evaluations of alpha_nu instead of one per angle.
+     angle_distribution is either an array of angle samples (e.g. the
+     observer angle of every cell), a (counts, bin_edges) tuple as
+     returned by numpy.histogram, or a callable pdf(angle) on [0, pi]
+     (e.g. scipy.stats.norm(mean, sigma).pdf); angles must lie in
+     [0, pi].  n_nodes must be odd.  A RuntimeWarning is issued when the
+     estimated error exceeds 1% of the average; with return_error=True,
+     (average, error estimate) is returned instead.  The other arguments
+     are the same as for alpha_nu_py(), without observer_angle."""
+
+  cdef parameters params
+  setConstParams(&params)
+  return _angle_average(params.ABSORPTIVITY, angle_distribution, nu,
+                        magnetic_field, electron_density, distribution,
+                        polarization, theta_e, power_law_p, gamma_min,
+                        gamma_max, gamma_cutoff, kappa, kappa_width,
+                        n_nodes, n_surrogate, continuum,
+                        mixture_weights, return_error)
+
+
+cdef Py_ssize_t _strided_double(value, strided_double *view, double *scalar,
+                                list keep) except -2:
+
+  """Points view at the memory of value through the buffer protocol,
+     without copying, and returns its length.  Scalars are stored in
+     *scalar and broadcast with stride 0 (length -1).  Objects that are
+     neither are converted to a float64 array first.  The memoryviews are
+     appended to keep so that they outlive the call."""
+
+  cdef const double[:] buf
+
+  try:
+    buf = value
+  except (TypeError, ValueError):
+    if np.ndim(value) == 0:
+      scalar[0]   = value
+      view.data   = scalar
+      view.stride = 0
+      return -1
+    buf = np.ascontiguousarray(value, dtype=np.float64)
+
+  keep.append(buf)
+  view.data   = &buf[0] if buf.shape[0] > 0 else NULL
+  view.stride = buf.strides[0]
+  return buf.shape[0]
+
+cdef Py_ssize_t _strided_int(value, strided_int *view, int *scalar,
+                             list keep) except -2:
+
+  """Same as _strided_double() for the integer keys; buffers of C ints are
+     used in place, other integer arrays are converted first."""
+
+  cdef const int[:] buf
+
+  try:
+    buf = value
+  except (TypeError, ValueError):
+    if np.ndim(value) == 0:
+      scalar[0]   = value
+      view.data   = scalar
+      view.stride = 0
+      return -1
+    buf = np.ascontiguousarray(value, dtype=np.intc)
+
+  keep.append(buf)
+  view.data   = &buf[0] if buf.shape[0] > 0 else NULL
+  view.stride = buf.strides[0]
+  return buf.shape[0]
+
+def _batch(int mode,
+           nu,
+           magnetic_field,
+           electron_density,
+           observer_angle,
+           distribution,
+           polarization,
+           theta_e,
+           power_law_p,
+           gamma_min,
+           gamma_max,
+           gamma_cutoff,
+           kappa,
+           kappa_width,
+           out,
+           bint n_surrogate,
+           bint continuum,
+           mixture_weights,
+           hooks=None):
+
+  """Evaluates j_nu or alpha_nu (depending on mode) for 1D strided inputs
+     and scalars, writing into out; see j_nu_batch_py().  After each
+     element, _stream_progress() checks for KeyboardInterrupt and calls the
+     progress and cancel functions of hooks (a _StreamHooks), if given."""
+
+  cdef parameters params
+  cdef batch_inputs inputs
+  cdef double scalars[11]
+  cdef int int_scalars[2]
+  cdef double[:] out_view
+  cdef char* error_message = NULL
+  cdef list keep = []
+  cdef size_t done = 0
+
+  lengths = [
+    _strided_double(nu, &inputs.nu, &scalars[0], keep),
+    _strided_double(magnetic_field, &inputs.magnetic_field,
+                    &scalars[1], keep),
+    _strided_double(electron_density, &inputs.electron_density,
+                    &scalars[2], keep),
+    _strided_double(observer_angle, &inputs.observer_angle,
+                    &scalars[3], keep),
+    _strided_int(distribution, &inputs.distribution, &int_scalars[0], keep),
+    _strided_int(polarization, &inputs.polarization, &int_scalars[1], keep),
+    _strided_double(theta_e, &inputs.theta_e, &scalars[4], keep),
+    _strided_double(power_law_p, &inputs.power_law_p, &scalars[5], keep),
+    _strided_double(gamma_min, &inputs.gamma_min, &scalars[6], keep),
+    _strided_double(gamma_max, &inputs.gamma_max, &scalars[7], keep),
+    _strided_double(gamma_cutoff, &inputs.gamma_cutoff, &scalars[8], keep),
+    _strided_double(kappa, &inputs.kappa, &scalars[9], keep),
+    _strided_double(kappa_width, &inputs.kappa_width, &scalars[10], keep)]
+
+  array_lengths = set(length for length in lengths if length >= 0)
+  if len(array_lengths) > 1:
+    raise ValueError ('array arguments have different lengths: %s'
+                      % sorted(array_lengths))
+  count = array_lengths.pop() if array_lengths else 1
+
+  if out is None:
+    out = np.empty(count)
+  out_view = out
+  if out_view.shape[0] != count:
+    raise ValueError ('out has length %d, expected %d'
+                      % (out_view.shape[0], count))
+  if count == 0:
+    return out
+
+  setConstParams(&params)
+  params.mode            = mode
+  _set_options(&params, n_surrogate, continuum, mixture_weights)
+
+  if hooks is None:
+    hooks = _StreamHooks(None, None, 0, count)
+  failures = symphony_integrate_batch_progress(&params, count, &inputs,
+                                               &out_view[0],
+                                               out_view.strides[0],
+                                               &_stream_progress,
+                                               <void*>hooks, &done,
+                                               &error_message)
+  if hooks.exception is not None:
+    free(error_message)
+    raise hooks.exception
+  if error_message:
+    message = error_message.decode('ascii', 'replace')
+    free(error_message)
+    raise RuntimeError ('%d of %d evaluations failed; first error: %s'
+                        % (failures, count, message))
+  return out
+
+def j_nu_batch_py(nu,
+                  magnetic_field,
+                  electron_density,
+                  observer_angle,
+                  distribution,
+                  polarization,
+                  theta_e,
+                  power_law_p,
+                  gamma_min,
+                  gamma_max,
+                  gamma_cutoff,
+                  kappa,
+                  kappa_width,
+                  out=None,
+                  bint n_surrogate=False,
+                  bint continuum=False,
+                  mixture_weights=None):
+
+  """Returns j_nu for a batch of inputs, with the same arguments as
+     j_nu_py().  Each argument is either a scalar, which is broadcast, or a
+     1D object supporting the buffer protocol (numpy arrays and strided
+     views of them such as fields of a structured array, memoryviews,
+     numpy.memmap), which is read in place without copying; float64 for
+     the physical parameters and C int for distribution and polarization.
+     Results are written to out (any writable 1D float64 buffer) if
+     given, otherwise to a new numpy array, which is returned.  Failed
+     evaluations are set to NaN and reported with a RuntimeError."""
+
+  cdef parameters params
+  setConstParams(&params)
+  return _batch(params.EMISSIVITY, nu, magnetic_field, electron_density,
+                observer_angle, distribution, polarization, theta_e,
+                power_law_p, gamma_min, gamma_max, gamma_cutoff, kappa,
+                kappa_width, out, n_surrogate, continuum,
+                mixture_weights)
+
+def alpha_nu_batch_py(nu,
+                      magnetic_field,
+                      electron_density,
+                      observer_angle,
+                      distribution,
+                      polarization,
+                      theta_e,
+                      power_law_p,
+                      gamma_min,
+                      gamma_max,
+                      gamma_cutoff,
+                      kappa,
+                      kappa_width,
+                      out=None,
+                      bint n_surrogate=False,
+                      bint continuum=False,
+                      mixture_weights=None):
+
+  """Returns alpha_nu for a batch of inputs, with the same arguments as
+     alpha_nu_py().  Each argument is either a scalar, which is broadcast,
+     or a 1D object supporting the buffer protocol (numpy arrays and
+     strided views of them such as fields of a structured array,
+     memoryviews, numpy.memmap), which is read in place without copying;
+     float64 for the physical parameters and C int for distribution and
+     polarization.  Results are written to out (any writable 1D float64
+     buffer) if given, otherwise to a new numpy array, which is returned.
+     Failed evaluations are set to NaN and reported with a RuntimeError."""
+
+  cdef parameters params
+  setConstParams(&params)
+  return _batch(params.ABSORPTIVITY, nu, magnetic_field, electron_density,
+                observer_angle, distribution, polarization, theta_e,
+                power_law_p, gamma_min, gamma_max, gamma_cutoff, kappa,
+                kappa_width, out, n_surrogate, continuum,
+                mixture_weights)
+
+
+class _StreamHooks(object):
+
+  """Progress and cancel functions of a stream, and the state that
+     _stream_progress() passes between them and the stream."""
+
+  def __init__(self, progress, cancel, offset, total):
+    self.progress  = progress
+    self.cancel    = cancel
+    self.offset    = offset
+    self.total     = total
+    self.cancelled = False
+    self.exception = None
+
+cdef int _stream_progress(size_t done, size_t count, void *data) noexcept:
+
+  """Progress function given to symphony_integrate_batch_progress(): calls
+     the progress and cancel functions of the _StreamHooks in data and
+     returns 1 to cancel the batch.  Exceptions (including
+     KeyboardInterrupt) are kept in the hooks and also cancel it.
+
+     The GIL is held while each element is evaluated, because the caches
+     of the C code are shared, and released here for a moment, so that
+     other threads can run (e.g. to set a cancel Event) between elements;
+     pending signals are handled here too."""
+
+  hooks = <object>data
+  try:
+    with nogil:
+      pass
+    PyErr_CheckSignals()
+    if hooks.progress is not None:
+      hooks.progress(hooks.offset + done, hooks.total)
+    if hooks.cancel is not None and hooks.cancel():
+      hooks.cancelled = True
+      return 1
+  except BaseException as exception:
+    hooks.exception = exception
+    return 1
+  return 0
+
+def _stream_chunk(int mode, start, inputs, bint n_surrogate, bint continuum,
+                  mixture_weights):
+
+  """Evaluates one chunk of a stream in a worker process; returns its
+     start, values, and the exception it raised, if any."""
+
+  try:
+    return start, _batch(mode, *(list(inputs) + [None, n_surrogate,
+                                                 continuum,
+                                                 mixture_weights])), None
+  except Exception as exception:
+    return start, None, exception
+
+def _stream(int mode,
+            inputs,
+            chunk_size,
+            progress,
+            cancel,
+            ordered,
+            processes,
+            bint n_surrogate,
+            bint continuum,
+            mixture_weights):
+
+  """Checks the arguments of j_nu_stream_py() and alpha_nu_stream_py() and
+     returns the generator behind them, so that invalid arguments raise
+     when the stream is created rather than when it is first iterated."""
+
+  if chunk_size < 1:
+    raise ValueError ('chunk_size must be at least 1')
+  if processes and processes < 0:
+    raise ValueError ('processes must not be negative')
+  if progress is not None and not callable(progress):
+    raise TypeError ('progress must be callable')
+
+  #cancel may be a threading.Event or multiprocessing.Event
+  if cancel is not None and hasattr(cancel, 'is_set'):
+    cancel = cancel.is_set
+  if cancel is not None and not callable(cancel):
+    raise TypeError ('cancel must be callable or an Event')
+
+  lengths = set(np.shape(value)[0] for value in inputs
+                if np.ndim(value) > 0)
+  if len(lengths) > 1:
+    raise ValueError ('array arguments have different lengths: %s'
+                      % sorted(lengths))
+  count = lengths.pop() if lengths else 1
+
+  #slices of other buffers, such as memoryviews, cannot be sent to worker
+  #processes
+  inputs = [value if np.ndim(value) == 0 else np.asarray(value)
+            for value in inputs]
+
+  return _stream_chunks(mode, inputs, count, chunk_size, progress, cancel,
+                        ordered, processes, n_surrogate, continuum,
+                        mixture_weights)
+
+def _stream_chunks(int mode,
+                   inputs,
+                   count,
+                   chunk_size,
+                   progress,
+                   cancel,
+                   ordered,
+                   processes,
+                   bint n_surrogate,
+                   bint continuum,
+                   mixture_weights):
+
+  """Generator behind j_nu_stream_py() and alpha_nu_stream_py(), for
+     arguments checked by _stream()."""
+
+  starts = range(0, count, chunk_size)
+
+  def chunk(start):
+    return [value if np.ndim(value) == 0
+            else value[start:start + chunk_size] for value in inputs]
+
+  if not processes:
+    for start in starts:
+      hooks  = _StreamHooks(progress, cancel, start, count)
+      values = _batch(mode, *(chunk(start) + [None, n_surrogate, continuum,
+                                              mixture_weights, hooks]))
+      if hooks.cancelled:
+        return
+      yield start, values
+    return
+
+  #evaluate the chunks in worker processes, keeping at most two chunks per
+  #process in flight so that memory stays bounded; closing the generator
+  #or cancelling terminates the workers.  The pool never completes a task
+  #whose worker died, so the workers are watched as well
+  others  = set(process.pid for process in multiprocessing.active_children())
+  pool    = multiprocessing.Pool(processes)
+  workers = [process for process in multiprocessing.active_children()
+             if process.pid not in others]
+  pending = []
+  results = {}
+  ready   = {}
+  done    = 0
+  starts  = iter(starts)
+  try:
+    while True:
+      while len(pending) < 2 * processes:
+        start = next(starts, None)
+        if start is None:
+          break
+        pending.append(start)
+        results[start] = pool.apply_async(_stream_chunk,
+                                          (mode, start, chunk(start),
+                                           n_surrogate, continuum,
+                                           mixture_weights))
+      if not pending:
+        return
+
+      #wait for the next chunk in order, or for any chunk; get() raises
+      #what failed outside _stream_chunk, e.g. pickling its arguments
+      while not (pending[0] in ready if ordered else ready):
+        if cancel is not None and cancel():
+          return
+        for start in pending:
+          if start not in ready and results[start].ready():
+            start, values, exception = results.pop(start).get()
+            if exception is not None:
+              raise exception
+            ready[start] = values
+        if not (pending[0] in ready if ordered else ready):
+          if not all(worker.is_alive() for worker in workers):
+            raise RuntimeError ('a worker process of the stream died')
+          waiting = [start for start in pending if start not in ready]
+          results[waiting[0]].wait(0.1)
+
+      start  = pending[0] if ordered else next(iter(ready))
+      values = ready.pop(start)
+      pending.remove(start)
+      done  += values.shape[0]
+      if progress is not None:
+        progress(done, count)
+      yield start, values
+  finally:
+    pool.terminate()
+    pool.join()
+
+
+def j_nu_stream_py(nu,
+                   magnetic_field,
+                   electron_density,
+                   observer_angle,
+                   distribution,
+                   polarization,
+                   theta_e,
+                   power_law_p,
+                   gamma_min,
+                   gamma_max,
+                   gamma_cutoff,
+                   kappa,
+                   kappa_width,
+                   chunk_size=1024,
+                   progress=None,
+                   cancel=None,
+                   bint ordered=True,
+                   processes=0,
+                   bint n_surrogate=False,
+                   bint continuum=False,
+                   mixture_weights=None):
+
+  """Generator version of j_nu_batch_py(), with the same arguments, that
+     yields (start, values) for consecutive chunks of chunk_size cells as
+     soon as each is done, where values holds j_nu of cells
+     start:start + len(values).
+
+     progress(done, count) is called with the number of cells done after
+     each cell, or after each chunk if processes > 0.  cancel is a
+     callable or a threading/multiprocessing Event; it is checked between
+     cells, and once it is true (or set) no further work is done and the
+     generator stops.  Other threads get to run between cells, so an Event
+     set from another thread, like KeyboardInterrupt, stops the stream
+     after the cell in progress.  Closing the generator, e.g. by leaving a
+     for loop early, also stops all work.  Invalid arguments raise when
+     the stream is created.
+
+     If processes > 0, chunks are evaluated in that many worker processes,
+     with at most two chunks per process in flight; with ordered=False
+     the chunks are then yielded as they complete instead of in order.
+     Failed evaluations raise a RuntimeError as in j_nu_batch_py()."""
+
+  cdef parameters params
+  setConstParams(&params)
+  return _stream(params.EMISSIVITY,
+                 [nu, magnetic_field, electron_density, observer_angle,
+                  distribution, polarization, theta_e, power_law_p,
+                  gamma_min, gamma_max, gamma_cutoff, kappa, kappa_width],
+                 chunk_size, progress, cancel, ordered, processes,
+                 n_surrogate, continuum, mixture_weights)
+
+def alpha_nu_stream_py(nu,
+                       magnetic_field,
+                       electron_density,
+                       observer_angle,
+                       distribution,
+                       polarization,
+                       theta_e,
+                       power_law_p,
+                       gamma_min,
+                       gamma_max,
+                       gamma_cutoff,
+                       kappa,
+                       kappa_width,
+                       chunk_size=1024,
+                       progress=None,
+                       cancel=None,
+                       bint ordered=True,
+                       processes=0,
+                       bint n_surrogate=False,
+                       bint continuum=False,
+                       mixture_weights=None):
+
+  """Generator version of alpha_nu_batch_py(); see j_nu_stream_py()."""
+
+  cdef parameters params
+  setConstParams(&params)
+  return _stream(params.ABSORPTIVITY,
+                 [nu, magnetic_field, electron_density, observer_angle,
+                  distribution, polarization, theta_e, power_law_p,
+                  gamma_min, gamma_max, gamma_cutoff, kappa, kappa_width],
+                 chunk_size, progress, cancel, ordered, processes,
+                 n_surrogate, continuum, mixture_weights)
+
+
+class IncrementalEvaluator(object):
+
+  """Evaluates j_nu (or alpha_nu, if absorptivity is True) for a sequence of
+     snapshots of the same cells, such as consecutive dumps of a
+     simulation, recomputing only the cells whose inputs have moved.
+
+     Each call takes the same arguments as j_nu_batch_py() (scalars are
+     broadcast) and returns a numpy array with one value per cell.  Every
+     cell remembers the inputs and result of its last exact evaluation.  A
+     cell is recomputed if its distribution or polarization key changed or
+     if any other input differs from the remembered one by more than
+     tolerance, relative to it; otherwise its result is the remembered one
+     scaled by the ratio of electron densities, which is exact because
+     j_nu and alpha_nu are linear in electron_density.  Since inputs are
+     compared to the last exact evaluation and not to the previous
+     snapshot, slow drifts cannot accumulate beyond tolerance; with
+     tolerance=0 every result is exact.
+
+     After each call, recomputed holds the number of cells that were
+     evaluated exactly and count the total number of cells.  A change in
+     the number of cells, or reset(), starts over from scratch.  Failed
+     evaluations raise a RuntimeError as in j_nu_batch_py() and leave the
+     remembered inputs and results unchanged."""
+
+  def __init__(self, absorptivity=False, tolerance=1e-3, n_surrogate=False,
+               continuum=False, mixture_weights=None):
+    if tolerance < 0.:
+      raise ValueError ('tolerance must be non-negative')
+    self.absorptivity    = absorptivity
+    self.tolerance       = tolerance
+    self.n_surrogate     = n_surrogate
+    self.continuum       = continuum
+    self.mixture_weights = mixture_weights
+    self.reset()
+
+  def reset(self):
+    """Forgets all remembered inputs and results."""
+    self._inputs    = None
+    self._results   = None
+    self.recomputed = 0
+    self.count      = 0
+
+  def __call__(self, nu, magnetic_field, electron_density, observer_angle,
+               distribution, polarization, theta_e, power_law_p, gamma_min,
+               gamma_max, gamma_cutoff, kappa, kappa_width):
+    cdef parameters params
+    setConstParams(&params)
+
+    inputs = [nu, magnetic_field, electron_density, observer_angle,
+              distribution, polarization, theta_e, power_law_p, gamma_min,
+              gamma_max, gamma_cutoff, kappa, kappa_width]
+    count  = max([np.size(value) for value in inputs
+                  if np.ndim(value) > 0] or [1])
+    inputs = [np.array(np.broadcast_to(value, (count,)),
+                       dtype=np.intc if index in (4, 5) else np.float64)
+              for index, value in enumerate(inputs)]
+
+    fresh = self._inputs is None or self._results.shape[0] != count
+
+    if fresh:
+      changed = np.ones(count, dtype=bool)
+    else:
+      old     = self._inputs
+      #previously failed cells and cells without electrons cannot be
+      #scaled from their remembered results
+      changed = ~np.isfinite(self._results) | (old[2] == 0.)
+      for index in range(len(inputs)):
+        if index == 2:
+          continue
+        if index in (4, 5):
+          changed |= inputs[index] != old[index]
+        else:
+          changed |= (np.abs(inputs[index] - old[index])
+                      > self.tolerance * np.abs(old[index]))
+
+    results = np.empty(count)
+    if not fresh:
+      kept          = ~changed
+      results[kept] = (self._results[kept] * inputs[2][kept]
+                       / self._inputs[2][kept])
+
+    mode = params.ABSORPTIVITY if self.absorptivity else params.EMISSIVITY
+    indices = np.flatnonzero(changed)
+    results[indices] = _batch(mode, *([value[indices] for value in inputs]
+                                      + [None, self.n_surrogate,
+                                         self.continuum,
+                                         self.mixture_weights]))
+
+    #remember the inputs and results of the cells evaluated exactly
+    if fresh:
+      self._inputs  = inputs
+      self._results = results.copy()
+    else:
+      for index in range(len(inputs)):
+        self._inputs[index][indices] = inputs[index][indices]
+      self._results[indices] = results[indices]
+
+    self.recomputed = indices.shape[0]
+    self.count      = count
+    return results
+
+
+class AdaptiveSample(object):
+
+  """Result of adaptive_sample_py(): the scattered points x, y at which the
+     function was evaluated, its values there, and the leaf cells of the
+     refinement, from which resample() interpolates onto any grid."""
+
+  def __init__(self, x_range, y_range, shape, level, values, leaves):
+    self._x_range = x_range
+    self._y_range = y_range
+    self._shape   = shape
+    self._level   = level
+    self._values  = values
+    self._leaves  = leaves
+
+    nodes       = sorted(values)
+    self.x      = np.array([self._coordinates(i, j)[0] for i, j in nodes])
+    self.y      = np.array([self._coordinates(i, j)[1] for i, j in nodes])
+    self.values = np.array([values[node] for node in nodes])
+
+  def _coordinates(self, i, j):
+    """Coordinates of node (i, j) of the finest lattice."""
+    return (self._x_range[0] + (self._x_range[1] - self._x_range[0])
+            * i / float((self._shape[0] - 1) << self._level),
+            self._y_range[0] + (self._y_range[1] - self._y_range[0])
+            * j / float((self._shape[1] - 1) << self._level))
+
+  def resample(self, x, y):
+    """Returns the sample interpolated onto the regular grid given by the
+       1D coordinate arrays x and y, as an array of shape (len(y), len(x))
+       as expected by pylab.contour(x, y, values).  Inside each leaf cell
+       the values are interpolated bilinearly from its corners; points
+       outside the sampled ranges are NaN."""
+
+    top = 1 << self._level
+    nx  = (self._shape[0] - 1) * top
+    ny  = (self._shape[1] - 1) * top
+
+    u = ((np.asarray(x, dtype=float) - self._x_range[0])
+         / (self._x_range[1] - self._x_range[0]) * nx)
+    v = ((np.asarray(y, dtype=float) - self._y_range[0])
+         / (self._y_range[1] - self._y_range[0]) * ny)
+    u, v = np.meshgrid(u, v)
+
+    outside = ~((u >= 0.) & (u <= nx) & (v >= 0.) & (v <= ny))
+    u[outside] = 0.
+    v[outside] = 0.
+
+    #leaves as (i, j, size) in units of the finest lattice, keyed by their
+    #lower corner, with the values at their corners
+    leaves  = np.array(self._leaves, dtype=np.int64).reshape(-1, 3)
+    keys    = leaves[:, 0] * (ny + 1) + leaves[:, 1]
+    corners = np.array([[self._values[(i, j)],
+                         self._values[(i + size, j)],
+                         self._values[(i, j + size)],
+                         self._values[(i + size, j + size)]]
+                        for i, j, size in self._leaves]).reshape(-1, 4)
+
+    #walk down the quadtree: each point takes the first leaf containing it,
+    #from the cells of the initial grid down to the finest lattice
+    leaf = np.full(u.shape, -1, dtype=np.int64)
+    size = top
+    while size >= 1:
+      candidates = np.flatnonzero(leaves[:, 2] == size)
+      if candidates.size:
+        candidates = candidates[np.argsort(keys[candidates])]
+        i   = np.clip(np.floor(u / size), 0, nx // size - 1) * size
+        j   = np.clip(np.floor(v / size), 0, ny // size - 1) * size
+        key = i.astype(np.int64) * (ny + 1) + j.astype(np.int64)
+        position = np.minimum(np.searchsorted(keys[candidates], key),
+                              candidates.size - 1)
+        found = (leaf < 0) & (keys[candidates[position]] == key)
+        leaf[found] = candidates[position[found]]
+      size //= 2
+
+    size = leaves[leaf, 2]
+    du   = np.clip((u - leaves[leaf, 0]) / size, 0., 1.)
+    dv   = np.clip((v - leaves[leaf, 1]) / size, 0., 1.)
+    f  = corners[leaf]
+
+    result = (  f[..., 0] * (1. - du) * (1. - dv)
+              + f[..., 1] * du        * (1. - dv)
+              + f[..., 2] * (1. - du) * dv
+              + f[..., 3] * du        * dv)
+    result[outside] = np.nan
+    return result
+
+def adaptive_sample_py(function,
+                       x_range,
+                       y_range,
+                       initial_shape=(9, 9),
+                       max_level=4,
+                       tolerance=1e-2,
+                       max_evaluations=None,
+                       vectorized=False):
+
+  """Samples function(x, y) on the rectangle x_range x y_range (for example
+     log10(nu/nu_c) and the observer angle of a contour scan), refining
+     only where it varies quickly.
+
+     The scan starts from a regular grid of initial_shape = (nx, ny)
+     points.  Each cell is refined into four by evaluating its center and
+     comparing it to the bilinear interpolation of its corners; cells
+     where the difference exceeds tolerance times the range of the values
+     sampled so far, and cells with both finite and non-finite corners
+     (e.g. the edge of a masked region), are split, up to max_level times.
+     If max_evaluations is given, the cells with the largest differences
+     are refined first and refinement stops before the budget is
+     exceeded; the initial grid and the centers of its cells are always
+     evaluated.
+
+     function is called once per point, or, if vectorized is True, once
+     per refinement level with arrays of x and y, and must return
+     matching arrays.  Returns an AdaptiveSample, which holds the
+     scattered points (x, y, values) and interpolates onto a regular grid
+     with resample(x, y)."""
+
+  nx, ny = initial_shape
+  if nx < 2 or ny < 2:
+    raise ValueError ('initial_shape needs at least 2 points in each '
+                      'direction')
+
+  x_range = (float(x_range[0]), float(x_range[1]))
+  y_range = (float(y_range[0]), float(y_range[1]))
+  values  = {}
+  top     = 1 << max_level
+
+  def coordinates(node):
+    return (x_range[0] + (x_range[1] - x_range[0])
+            * node[0] / float((nx - 1) * top),
+            y_range[0] + (y_range[1] - y_range[0])
+            * node[1] / float((ny - 1) * top))
+
+  def evaluate(nodes):
+    nodes = [node for node in sorted(set(nodes)) if node not in values]
+    if not nodes:
+      return
+    x, y = np.array([coordinates(node) for node in nodes]).T
+    if vectorized:
+      results = np.asarray(function(x, y), dtype=float)
+    else:
+      results = [function(x_k, y_k) for x_k, y_k in zip(x, y)]
+    for node, result in zip(nodes, results):
+      values[node] = float(result)
+
+  evaluate([(i * top, j * top) for i in range(nx) for j in range(ny)])
+
+  #cells are (i, j, size) in units of the finest lattice
+  active = [(i * top, j * top, top)
+            for i in range(nx - 1) for j in range(ny - 1)]
+  leaves = []
+
+  for level in range(max_level):
+    half = active[0][2] // 2 if active else 0
+    evaluate([(i + half, j + half) for i, j, size in active])
+
+    finite = np.array([value for value in values.values()
+                       if np.isfinite(value)])
+    scale  = finite.max() - finite.min() if finite.size else 0.
+
+    errors = []
+    for cell in active:
+      i, j, size = cell
+      f = np.array([values[(i, j)], values[(i + size, j)],
+                    values[(i, j + size)], values[(i + size, j + size)],
+                    values[(i + half, j + half)]])
+      if np.all(np.isfinite(f)):
+        errors.append(abs(f[4] - f[:4].mean()))
+      elif np.any(np.isfinite(f)):
+        errors.append(np.inf)
+      else:
+        errors.append(0.)
+
+    #refine the cells with the largest errors first; each costs at most
+    #4 edge midpoints and, below the last level, 4 centers of its children
+    order   = sorted(range(len(active)), key=lambda k: -errors[k])
+    refined = []
+    cost    = 8 if level + 1 < max_level else 4
+    budget  = (np.inf if max_evaluations is None
+               else max_evaluations - len(values))
+    for k in order:
+      if errors[k] <= tolerance * scale or budget < cost:
+        leaves.append(active[k])
+        continue
+      refined.append(active[k])
+      budget -= cost
+
+    active = []
+    for i, j, size in refined:
+      active += [(i, j, half), (i + half, j, half),
+                 (i, j + half, half), (i + half, j + half, half)]
+
+    #the edge midpoints of the refined cells are corners of their children
+    evaluate([node for i, j, size in refined for node in
+              ((i + half, j), (i, j + half), (i + size, j + half),
+               (i + half, j + size))])
+
+    if not active:
+      break
+
+  leaves += active
+
+  return AdaptiveSample(x_range, y_range, (nx, ny), max_level, values,
+                        leaves)
+
+
 #DEFINE KEYS FOR DISTRIBUTION FUNCTIONS
 MAXWELL_JUETTNER = 0
 POWER_LAW        = 1
 KAPPA_DIST       = 2
+MIXTURE          = 3
 
 #DEFINE KEYS FOR STOKES PARAMETERS
 STOKES_I         = 15
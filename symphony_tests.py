@@ -1,4 +1,6 @@
+import os
 import sys
+import time
 #symphony_build_path = '/home/mani/work/symphony/build'
 #symphony_build_path = '/home/alex/Documents/Spring_2016/symphony/symphony/build'
 symphony_build_path = 'build'
@@ -401,3 +403,349 @@ if(np.abs(Kappa_V_abs - Kappa_V_exp_abs)/Kappa_V_exp_abs > 0.01):
         print 'STOKES_V                                     FAIL'
 else:
         print 'STOKES_V                                     PASS'
+
+print ''
+print 'Testing n-surrogate integrated values'
+print '-------------------------------------------------------------------'
+
+surrogate_cases = [('Maxwell-Juettner', sp.MAXWELL_JUETTNER,
+                    [MJ_I_exp, MJ_Q_exp, MJ_V_exp],
+                    [MJ_I_exp_abs, MJ_Q_exp_abs, MJ_V_exp_abs]),
+                   ('Power-law', sp.POWER_LAW,
+                    [PL_I_exp, PL_Q_exp, PL_V_exp],
+                    [PL_I_exp_abs, PL_Q_exp_abs, PL_V_exp_abs]),
+                   ('Kappa', sp.KAPPA_DIST,
+                    [Kappa_I_exp, Kappa_Q_exp, Kappa_V_exp],
+                    [Kappa_I_exp_abs, Kappa_Q_exp_abs, Kappa_V_exp_abs])]
+
+for name, distribution, emiss_exp, abs_exp in surrogate_cases:
+    for label, func, expected in [('Emissivities', sp.j_nu_py, emiss_exp),
+                                  ('Absorptivities', sp.alpha_nu_py, abs_exp)]:
+        print name + ' ' + label
+        for stokes, stokes_name, exp in zip([sp.STOKES_I, sp.STOKES_Q,
+                                             sp.STOKES_V],
+                                            ['I', 'Q', 'V'], expected):
+            value = func(nu, B, n_e, obs_angle, distribution, stokes,
+                         theta_e, power_law_p, gamma_min, gamma_max,
+                         gamma_cutoff, kappa, kappa_width, n_surrogate=True)
+            #the expected Stokes V values above have the opposite sign to
+            #the IEEE/IAU convention of polarization_term()
+            if(stokes == sp.STOKES_V):
+                value = -value
+            if(np.abs(value - exp)/np.abs(exp) > 0.01):
+                print 'STOKES_' + stokes_name + '                                     FAIL'
+            else:
+                print 'STOKES_' + stokes_name + '                                     PASS'
+        print ''
+
+#the error estimate of the surrogate n integral
+MJ_I_surrogate, MJ_I_error = sp.j_nu_py(nu, B, n_e, obs_angle,
+                                        sp.MAXWELL_JUETTNER, sp.STOKES_I,
+                                        theta_e, power_law_p, gamma_min,
+                                        gamma_max, gamma_cutoff, kappa,
+                                        kappa_width, n_surrogate=True,
+                                        return_error=True)
+if(not 0. < MJ_I_error < 1e-2*np.abs(MJ_I_surrogate)
+   or np.abs(MJ_I_surrogate - MJ_I_exp) > 0.01*np.abs(MJ_I_exp)):
+        print 'error estimate                               FAIL'
+else:
+        print 'error estimate                               PASS'
+print ''
+
+print 'Testing angle-averaged values'
+print '-------------------------------------------------------------------'
+
+#brute-force averages of j_nu_py over a spread of samples (on both sides of
+#pi/2), a histogram and a pdf, all of which need several nodes
+def j_nu_brute_force(angles, weights, stokes):
+    values = [sp.j_nu_py(nu, B, n_e, angle, sp.MAXWELL_JUETTNER, stokes,
+                         theta_e, power_law_p, gamma_min, gamma_max,
+                         gamma_cutoff, kappa, kappa_width)
+              for angle in angles]
+    return np.dot(weights, values)/np.sum(weights)
+
+spread_angles = np.linspace(0.3, 2.6, 40)
+hist_counts   = np.array([1., 2., 3., 3., 2., 1.])
+hist_edges    = np.linspace(0.2, 1.4, 7)
+hist_angles   = (hist_edges[:-1, None] + (np.arange(8) + 0.5)[None, :]/8.
+                 * np.diff(hist_edges)[:, None]).ravel()
+angle_pdf     = lambda angle: np.exp(-0.5 * ((angle - 1.) / 0.2)**2)
+pdf_angles    = 0.2 + (np.arange(64) + 0.5) * 1.6/64.
+
+for name, distribution, angles, weights, stokes in [
+        ('samples, STOKES_I', spread_angles, spread_angles,
+         np.ones(40), sp.STOKES_I),
+        ('samples, STOKES_V', spread_angles, spread_angles,
+         np.ones(40), sp.STOKES_V),
+        ('histogram, STOKES_I', (hist_counts, hist_edges), hist_angles,
+         np.repeat(hist_counts, 8), sp.STOKES_I),
+        ('pdf, STOKES_I', angle_pdf, pdf_angles, angle_pdf(pdf_angles),
+         sp.STOKES_I)]:
+    average, error = sp.j_nu_angle_averaged_py(distribution, nu, B, n_e,
+                                               sp.MAXWELL_JUETTNER, stokes,
+                                               theta_e, power_law_p,
+                                               gamma_min, gamma_max,
+                                               gamma_cutoff, kappa,
+                                               kappa_width,
+                                               return_error=True)
+    exp = j_nu_brute_force(angles, weights, stokes)
+    if(np.abs(average - exp)/np.abs(exp) > 0.01
+       or error/np.abs(exp) > 0.01):
+        print (name + ' ' * 45)[:45] + 'FAIL'
+    else:
+        print (name + ' ' * 45)[:45] + 'PASS'
+
+#angles outside [0, pi] are rejected rather than folded
+try:
+    sp.j_nu_angle_averaged_py([1., -0.2], nu, B, n_e, sp.MAXWELL_JUETTNER,
+                              sp.STOKES_I, theta_e, power_law_p, gamma_min,
+                              gamma_max, gamma_cutoff, kappa, kappa_width)
+    print 'angles outside [0, pi]                       FAIL'
+except ValueError:
+    print 'angles outside [0, pi]                       PASS'
+
+print ''
+print 'Testing batch evaluation'
+print '-------------------------------------------------------------------'
+
+#one cell per Stokes parameter, broadcasting every other argument
+batch_polarizations = np.array([sp.STOKES_I, sp.STOKES_Q, sp.STOKES_V],
+                               dtype=np.intc)
+
+MJ_batch = sp.j_nu_batch_py(nu, B, n_e, obs_angle, sp.MAXWELL_JUETTNER,
+                            batch_polarizations, theta_e, power_law_p,
+                            gamma_min, gamma_max, gamma_cutoff, kappa,
+                            kappa_width)
+for stokes_name, value, exp in zip(['I', 'Q', 'V'], MJ_batch,
+                                   [MJ_I_exp, MJ_Q_exp, MJ_V_exp]):
+    #the expected Stokes V value above has the opposite sign to the
+    #IEEE/IAU convention of polarization_term()
+    if(stokes_name == 'V'):
+        value = -value
+    if(np.abs(value - exp)/np.abs(exp) > 0.01):
+        print 'STOKES_' + stokes_name + '                                     FAIL'
+    else:
+        print 'STOKES_' + stokes_name + '                                     PASS'
+
+print ''
+print 'Testing continuum limit against exact values'
+print '-------------------------------------------------------------------'
+
+#nu/nu_c ~ 3e3 (the values above) and ~ 1e5, for the emissivity and the
+#absorptivity of all three distributions; only alpha_nu, Stokes Q of the
+#power law at 3e3 falls back to the exact sum
+for test_nu in [nu, 40. * nu]:
+    print 'nu = %e' % test_nu
+    for distribution, distribution_name in zip([sp.MAXWELL_JUETTNER,
+                                                sp.POWER_LAW,
+                                                sp.KAPPA_DIST],
+                                               ['MJ', 'PL', 'Kappa']):
+        for function, function_name in zip([sp.j_nu_py, sp.alpha_nu_py],
+                                           ['j_nu', 'alpha_nu']):
+            for stokes, stokes_name in zip([sp.STOKES_I, sp.STOKES_Q],
+                                           ['I', 'Q']):
+                name = (distribution_name + ' ' + function_name
+                        + ' STOKES_' + stokes_name + ' ' * 45)[:45]
+                exact = function(test_nu, B, n_e, obs_angle, distribution,
+                                 stokes, theta_e, power_law_p, gamma_min,
+                                 gamma_max, gamma_cutoff, kappa,
+                                 kappa_width)
+                continuum = function(test_nu, B, n_e, obs_angle,
+                                     distribution, stokes, theta_e,
+                                     power_law_p, gamma_min, gamma_max,
+                                     gamma_cutoff, kappa, kappa_width,
+                                     continuum=True)
+                if(np.abs(continuum - exact)/np.abs(exact) > 0.01):
+                    print name + 'FAIL'
+                else:
+                    print name + 'PASS'
+
+print ''
+print 'Testing mixture distribution'
+print '-------------------------------------------------------------------'
+
+#half thermal, half kappa electrons: the coefficients are linear in f
+mixture_weights = (0.5, 0., 0.5)
+
+Mix_I = sp.j_nu_py(nu, B, n_e, obs_angle, sp.MIXTURE, sp.STOKES_I,
+                   theta_e, power_law_p, gamma_min, gamma_max,
+                   gamma_cutoff, kappa, kappa_width,
+                   mixture_weights=mixture_weights)
+Mix_I_exp = 0.5 * MJ_I_exp + 0.5 * Kappa_I_exp
+if(np.abs(Mix_I - Mix_I_exp)/Mix_I_exp > 0.01):
+        print 'STOKES_I emissivity                          FAIL'
+else:
+        print 'STOKES_I emissivity                          PASS'
+
+Mix_I_abs = sp.alpha_nu_py(nu, B, n_e, obs_angle, sp.MIXTURE, sp.STOKES_I,
+                           theta_e, power_law_p, gamma_min, gamma_max,
+                           gamma_cutoff, kappa, kappa_width,
+                           mixture_weights=mixture_weights)
+Mix_I_exp_abs = 0.5 * MJ_I_exp_abs + 0.5 * Kappa_I_exp_abs
+if(np.abs(Mix_I_abs - Mix_I_exp_abs)/Mix_I_exp_abs > 0.01):
+        print 'STOKES_I absorptivity                        FAIL'
+else:
+        print 'STOKES_I absorptivity                        PASS'
+
+print ''
+print 'Testing incremental evaluation'
+print '-------------------------------------------------------------------'
+
+#second snapshot: the density of every cell changes, |B| of the last cell
+#changes by 10%, and only that cell must be recomputed
+incremental = sp.IncrementalEvaluator(tolerance=1e-3)
+snapshot_B  = np.array([B, B, B])
+incremental(nu, snapshot_B, np.array([n_e, n_e, n_e]), obs_angle,
+            sp.MAXWELL_JUETTNER, sp.STOKES_I, theta_e, power_law_p,
+            gamma_min, gamma_max, gamma_cutoff, kappa, kappa_width)
+snapshot_B[2] = 1.1 * B
+MJ_incremental = incremental(nu, snapshot_B,
+                             np.array([2. * n_e, 0.5 * n_e, n_e]),
+                             obs_angle, sp.MAXWELL_JUETTNER, sp.STOKES_I,
+                             theta_e, power_law_p, gamma_min, gamma_max,
+                             gamma_cutoff, kappa, kappa_width)
+MJ_exact = sp.j_nu_py(nu, 1.1 * B, n_e, obs_angle, sp.MAXWELL_JUETTNER,
+                      sp.STOKES_I, theta_e, power_law_p, gamma_min,
+                      gamma_max, gamma_cutoff, kappa, kappa_width)
+MJ_incremental_exp = np.array([2. * MJ_I_exp, 0.5 * MJ_I_exp, MJ_exact])
+if(   incremental.recomputed != 1
+   or np.any(np.abs(MJ_incremental - MJ_incremental_exp)
+             / MJ_incremental_exp > 0.01)):
+        print 'STOKES_I emissivity                          FAIL'
+else:
+        print 'STOKES_I emissivity                          PASS'
+
+print ''
+print 'Testing adaptive sampling of a (nu, observer angle) scan'
+print '-------------------------------------------------------------------'
+
+nu_c = 2.8e6 * B
+
+def log_MJ_I_fit(log_nu_ratio, angle):
+    return np.log10(sp.j_nu_fit_py(10.**log_nu_ratio * nu_c, B, n_e, angle,
+                                   sp.MAXWELL_JUETTNER, sp.STOKES_I,
+                                   theta_e, power_law_p, gamma_min,
+                                   gamma_max, gamma_cutoff, kappa,
+                                   kappa_width))
+
+#tolerance is relative to the range of the values, ~22 decades here, so
+#3e-4 asks for ~0.007 decades; the full finest lattice would need
+#(8 * 2**4 + 1)**2 = 16641 evaluations
+adaptive = sp.adaptive_sample_py(log_MJ_I_fit, (1., 6.), (0.2, 1.4),
+                                 tolerance=3e-4)
+grid_log_nu_ratio = np.linspace(1., 6., 20)
+grid_angle        = np.linspace(0.2, 1.4, 20)
+grid_exp = np.array([[log_MJ_I_fit(x, y) for x in grid_log_nu_ratio]
+                     for y in grid_angle])
+if(np.max(np.abs(adaptive.resample(grid_log_nu_ratio, grid_angle)
+                 - grid_exp)) > 0.01 or len(adaptive.values) > 16641/2):
+        print 'STOKES_I emissivity fit                      FAIL'
+else:
+        print 'STOKES_I emissivity fit                      PASS'
+
+#resample() interpolates from the leaves, so a deep sample costs no more
+#than its evaluations; its finest lattice would have (8 * 2**10 + 1)**2
+#points
+deep = sp.adaptive_sample_py(log_MJ_I_fit, (1., 6.), (0.2, 1.4),
+                             tolerance=3e-4, max_level=10,
+                             max_evaluations=6000)
+if(np.max(np.abs(deep.resample(grid_log_nu_ratio, grid_angle)
+                 - grid_exp)) > 0.01 or len(deep.values) > 6000):
+        print 'STOKES_I emissivity fit, max_level=10        FAIL'
+else:
+        print 'STOKES_I emissivity fit, max_level=10        PASS'
+
+print ''
+print 'Testing streaming evaluation'
+print '-------------------------------------------------------------------'
+
+#one chunk per Stokes parameter; cancelling after the first cell stops the
+#stream before the first chunk is yielded
+stream_progress = []
+MJ_stream = [values[0] for start, values in
+             sp.j_nu_stream_py(nu, B, n_e, obs_angle, sp.MAXWELL_JUETTNER,
+                               batch_polarizations, theta_e, power_law_p,
+                               gamma_min, gamma_max, gamma_cutoff, kappa,
+                               kappa_width, chunk_size=1,
+                               progress=lambda done, count:
+                                   stream_progress.append(done))]
+MJ_cancelled = list(sp.j_nu_stream_py(nu, B, n_e, obs_angle,
+                                      sp.MAXWELL_JUETTNER,
+                                      batch_polarizations, theta_e,
+                                      power_law_p, gamma_min, gamma_max,
+                                      gamma_cutoff, kappa, kappa_width,
+                                      cancel=lambda: True))
+for stokes_name, value, exp in zip(['I', 'Q', 'V'], MJ_stream,
+                                   [MJ_I_exp, MJ_Q_exp, MJ_V_exp]):
+    #the expected Stokes V value above has the opposite sign to the
+    #IEEE/IAU convention of polarization_term()
+    if(stokes_name == 'V'):
+        value = -value
+    if(np.abs(value - exp)/np.abs(exp) > 0.01):
+        print 'STOKES_' + stokes_name + '                                     FAIL'
+    else:
+        print 'STOKES_' + stokes_name + '                                     PASS'
+if(stream_progress != [1, 2, 3] or MJ_cancelled != []):
+        print 'progress and cancellation                    FAIL'
+else:
+        print 'progress and cancellation                    PASS'
+
+#invalid arguments raise when the stream is created, not when iterated
+try:
+    sp.j_nu_stream_py(nu, B, n_e, obs_angle, sp.MAXWELL_JUETTNER,
+                      batch_polarizations, theta_e, power_law_p, gamma_min,
+                      gamma_max, gamma_cutoff, kappa, np.ones(2),
+                      chunk_size=0)
+    print 'invalid arguments                            FAIL'
+except ValueError:
+    print 'invalid arguments                            PASS'
+
+#a chunk that cannot be sent to a worker, or whose worker dies, raises;
+#the cancel deadline only stops the test from hanging if it does not
+class Unpicklable(float):
+    def __reduce__(self):
+        raise TypeError('Unpicklable cannot be pickled')
+
+class ExitsWorker(float):
+    def __reduce__(self):
+        return (os._exit, (1,))
+
+def stream_with_theta_e(theta_e):
+    deadline = time.time() + 60.
+    return list(sp.j_nu_stream_py(nu, B, n_e, obs_angle,
+                                  sp.MAXWELL_JUETTNER,
+                                  memoryview(batch_polarizations), theta_e,
+                                  power_law_p, gamma_min, gamma_max,
+                                  gamma_cutoff, kappa, kappa_width,
+                                  chunk_size=1, processes=1,
+                                  cancel=lambda: time.time() > deadline))
+
+try:
+    stream_with_theta_e(Unpicklable(theta_e))
+    print 'unpicklable argument                         FAIL'
+except TypeError:
+    print 'unpicklable argument                         PASS'
+try:
+    stream_with_theta_e(ExitsWorker(theta_e))
+    print 'worker process dying                         FAIL'
+except RuntimeError:
+    print 'worker process dying                         PASS'
+
+print ''
+print 'Testing threaded evaluation'
+print '-------------------------------------------------------------------'
+
+#the result with several threads must be identical to that with one thread
+MJ_I_threads = [sp.j_nu_py(nu, B, n_e, obs_angle, sp.MAXWELL_JUETTNER,
+                           sp.STOKES_I, theta_e, power_law_p, gamma_min,
+                           gamma_max, gamma_cutoff, kappa, kappa_width,
+                           threads=threads)
+                for threads in [1, 2, 4]]
+if(np.abs(MJ_I_threads[0] - MJ_I_exp)/np.abs(MJ_I_exp) > 0.01):
+        print 'STOKES_I                                     FAIL'
+else:
+        print 'STOKES_I                                     PASS'
+if(MJ_I_threads[1:] != MJ_I_threads[:1] * 2):
+        print 'independent of the number of threads         FAIL'
+else:
+        print 'independent of the number of threads         PASS'